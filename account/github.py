@@ -0,0 +1,204 @@
+"""
+GitHub API clients: an async one for the login flow and a sync one, with
+conditional requests and rate-limit backoff, for profile refreshes.
+"""
+import asyncio
+import contextlib
+import contextvars
+import email.utils
+import hashlib
+import threading
+import time
+
+import httpx
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+
+TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10)
+REQUEST_TIMEOUT = (5, 10)  # connect, read
+ETAG_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+MAX_RETRIES = 3
+
+_async_client = contextvars.ContextVar("github_async_client", default=None)
+_local = threading.local()
+
+
+class GitHubError(Exception):
+    """Raised when GitHub rejects a request or returns something unusable."""
+
+
+class RateLimited(GitHubError):
+    """Raised when GitHub asks us to wait longer than the caller allows."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"GitHub rate limit hit, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+@contextlib.asynccontextmanager
+async def async_session():
+    """
+    Share one keep-alive client between the GitHub calls made inside the
+    block, and close it on the way out.
+
+    Under WSGI every async view runs on a fresh event loop, so a client can
+    not outlive the request. Within one login it still saves the connection
+    setup for the profile and email requests that follow the token exchange.
+    """
+    client = httpx.AsyncClient(timeout=TIMEOUT, limits=LIMITS, headers={"Accept": "application/json"})
+    token = _async_client.set(client)
+    try:
+        yield client
+    finally:
+        _async_client.reset(token)
+        await client.aclose()
+
+
+def get_async_client():
+    """Return the client of the enclosing ``async_session()``."""
+    client = _async_client.get()
+    if client is None:
+        raise RuntimeError("GitHub calls must be made inside async_session()")
+    return client
+
+
+async def exchange_code(code):
+    """Exchange an OAuth2 authorization code for an access token."""
+    response = await get_async_client().post(
+        settings.GITHUB_OAUTH2_TOKEN_URL,
+        data={
+            "client_id": settings.GITHUB_CLIENT_ID,
+            "client_secret": settings.GITHUB_CLIENT_SECRET,
+            "code": code,
+        },
+    )
+    access_token = response.json().get("access_token") if response.is_success else None
+    if not access_token:
+        raise GitHubError("GitHub did not return an access token")
+    return access_token
+
+
+async def _get_json(url, access_token):
+    response = await get_async_client().get(url, headers={"Authorization": f"Bearer {access_token}"})
+    if not response.is_success:
+        raise GitHubError(f"{url} returned {response.status_code}")
+    return response.json()
+
+
+async def fetch_profile(access_token):
+    """
+    Fetch the user's profile and email addresses concurrently. Emails are
+    optional, a failure there leaves them as ``None``.
+    """
+    user_data, emails = await asyncio.gather(
+        _get_json(settings.GITHUB_OAUTH2_USER_URL, access_token),
+        _get_json(settings.GITHUB_OAUTH2_EMAILS_URL, access_token),
+        return_exceptions=True,
+    )
+    for result in (user_data, emails):
+        if isinstance(result, BaseException) and not isinstance(result, Exception):
+            raise result
+    if isinstance(user_data, Exception):
+        raise GitHubError("Could not fetch the GitHub profile") from user_data
+    if isinstance(emails, Exception):
+        emails = None
+    return user_data, emails
+
+
+def get_session():
+    """Return this thread's keep-alive ``requests`` session."""
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = _local.session = requests.Session()
+        session.mount("https://", HTTPAdapter(pool_maxsize=10))
+        session.headers["Accept"] = "application/vnd.github+json"
+    return session
+
+
+def _limit_key(access_token):
+    return f"github_ratelimit:{hashlib.sha256(access_token.encode()).hexdigest()[:16]}"
+
+
+def parse_retry_after(value):
+    """
+    Seconds until ``value``, given as a delay or an HTTP-date, or ``None``
+    when it cannot be parsed.
+    """
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at.timestamp() - time.time(), 0)
+
+
+def rate_limit_wait(response):
+    """
+    Seconds GitHub asks us to wait before the next request, or ``None``.
+    """
+    if "Retry-After" in response.headers:
+        return parse_retry_after(response.headers["Retry-After"])
+    if response.headers.get("X-RateLimit-Remaining") == "0":
+        try:
+            return max(float(response.headers.get("X-RateLimit-Reset", 0)) - time.time(), 0)
+        except ValueError:
+            return None
+    return None
+
+
+def _request(url, access_token, headers, max_wait):
+    limit_key = _limit_key(access_token)
+    for attempt in range(MAX_RETRIES):
+        # Don't spend requests while a known limit for this token is active
+        blocked_until = cache.get(limit_key)
+        if blocked_until and blocked_until > time.time():
+            wait = blocked_until - time.time()
+            if wait > max_wait:
+                raise RateLimited(wait)
+            time.sleep(wait)
+
+        response = get_session().get(
+            url,
+            headers={"Authorization": f"Bearer {access_token}", **headers},
+            timeout=REQUEST_TIMEOUT,
+        )
+        wait = rate_limit_wait(response)
+        if wait is not None:
+            cache.set(limit_key, time.time() + wait, timeout=int(wait) + 1)
+        if response.status_code not in (403, 429) or wait is None:
+            return response
+        if wait > max_wait:
+            raise RateLimited(wait)
+        time.sleep(wait or 2 ** attempt)
+    raise RateLimited(wait)
+
+
+def get_json(url, access_token, cache_key, max_wait=5):
+    """
+    GET a GitHub resource, revalidating the copy cached under ``cache_key``
+    with its ETag. A 304 reuses the cached data and costs no rate limit.
+
+    Waits up to ``max_wait`` seconds when rate limited, beyond that
+    ``RateLimited`` is raised.
+    """
+    cached = cache.get(cache_key)
+    headers = {"If-None-Match": cached[0]} if cached else {}
+    try:
+        response = _request(url, access_token, headers, max_wait)
+        if response.status_code == 304 and cached:
+            return cached[1]
+        if response.status_code != 200:
+            raise GitHubError(f"{url} returned {response.status_code}")
+        data = response.json()
+    except requests.RequestException as exc:
+        # Also covers a 200 whose body is not JSON
+        raise GitHubError(f"{url} failed: {exc}") from exc
+    if response.headers.get("ETag"):
+        cache.set(cache_key, (response.headers["ETag"], data), timeout=ETAG_CACHE_TIMEOUT)
+    return data
@@ -0,0 +1,103 @@
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.utils import timezone
+
+from account import github
+from account.models import User
+
+
+class Command(BaseCommand):
+    help = "Refresh every user's profile from GitHub with a bounded number of concurrent requests."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8, help="Concurrent GitHub requests")
+        parser.add_argument("--max-age", type=float, default=24, help="Skip users refreshed within this many hours")
+        parser.add_argument("--force", action="store_true", help="Refresh users whose data is still fresh")
+        parser.add_argument("--batch-size", type=int, default=100, help="Users written per bulk update")
+        parser.add_argument(
+            "--max-wait", type=float, default=60, help="Longest rate-limit wait, in seconds, before stopping"
+        )
+
+    def handle(self, *args, **options):
+        if min(options["workers"], options["batch_size"]) < 1:
+            raise CommandError("--workers and --batch-size must be at least 1.")
+
+        users = User.objects.exclude(access_token__isnull=True).exclude(access_token="")
+        if not options["force"]:
+            cutoff = timezone.now() - timedelta(hours=options["max_age"])
+            users = users.filter(Q(github_synced_at__isnull=True) | Q(github_synced_at__lt=cutoff))
+
+        stop = threading.Event()
+
+        def fetch(user):
+            # Once GitHub asks for a longer pause than allowed, skip the rest
+            if stop.is_set():
+                return None
+            try:
+                return user.fetch_github_profile(max_wait=options["max_wait"])
+            except github.RateLimited:
+                stop.set()
+                raise
+
+        refreshed, failed = 0, 0
+        changed_users, changed_fields, unchanged = [], set(), []
+
+        def flush():
+            # Changed users get one bulk UPDATE over the columns that moved,
+            # unchanged ones only have their sync time bumped
+            now = timezone.now()
+            for user in changed_users:
+                user.github_synced_at = now
+            if changed_users:
+                User.objects.bulk_update(changed_users, [*changed_fields, "github_synced_at"])
+            if unchanged:
+                User.objects.filter(pk__in=unchanged).update(github_synced_at=now)
+            changed_users.clear()
+            changed_fields.clear()
+            unchanged.clear()
+
+        # Only a few users per worker are queued at a time, so memory stays
+        # flat and a rate-limit stop also stops submitting
+        users = users.iterator(chunk_size=options["batch_size"])
+        max_pending = options["workers"] * 2
+        pending = {}
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            while True:
+                while not stop.is_set() and len(pending) < max_pending:
+                    user = next(users, None)
+                    if user is None:
+                        break
+                    pending[pool.submit(fetch, user)] = user
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    user = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except github.GitHubError as exc:
+                        failed += 1
+                        self.stderr.write(f"{user}: {exc}")
+                        continue
+                    if result is None:
+                        continue
+
+                    refreshed += 1
+                    fields = user.apply_github_profile(*result)
+                    if fields:
+                        changed_users.append(user)
+                        changed_fields.update(fields)
+                    else:
+                        unchanged.append(user.pk)
+                    if len(changed_users) + len(unchanged) >= options["batch_size"]:
+                        flush()
+        flush()
+
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {refreshed} profiles, {failed} failed."))
+        if stop.is_set():
+            raise CommandError("Stopped early on the GitHub rate limit, run again after it resets.")
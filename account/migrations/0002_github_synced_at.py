@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 03:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='github_synced_at',
+            field=models.DateTimeField(blank=True, help_text='When the profile was last refreshed from GitHub', null=True),
+        ),
+    ]
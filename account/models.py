@@ -1,8 +1,10 @@
 from django.core.cache import cache
 from django.db import models
 from django.contrib.auth.models import AbstractUser
-import requests
 from django.conf import settings
+from django.utils import timezone
+
+from . import github
 
 SCOPE = ["user:email", "read:user"]
 
@@ -26,6 +28,9 @@ class User(AbstractUser):
     raw_data = models.JSONField(
         blank=True, null=True, help_text="Raw data from GitHub API"
     )
+    github_synced_at = models.DateTimeField(
+        blank=True, null=True, help_text="When the profile was last refreshed from GitHub"
+    )
 
     def __str__(self):
         return self.name or self.username
@@ -46,11 +51,13 @@ class User(AbstractUser):
         data = cache.get(cache_key)
 
         if data is None or force_refresh:
-            headers = {"Authorization": f"Bearer {self.access_token}"}
-            response = requests.get(settings.GITHUB_OAUTH2_USER_URL, headers=headers)
-            if response.status_code == 200:
-                data = response.json()
-                cache.set(cache_key, data, timeout=60 * 15)  # cache for 15 minutes
+            try:
+                data = github.get_json(
+                    settings.GITHUB_OAUTH2_USER_URL, self.access_token, f"github_etag:data:{self.pk}"
+                )
+            except github.GitHubError:
+                return data
+            cache.set(cache_key, data, timeout=60 * 15)  # cache for 15 minutes
         return data
 
     def fetch_github_emails(self, force_refresh=False):
@@ -64,13 +71,64 @@ class User(AbstractUser):
         emails = cache.get(cache_key)
 
         if emails is None or force_refresh:
-            headers = {"Authorization": f"Bearer {self.access_token}"}
-            response = requests.get(settings.GITHUB_OAUTH2_EMAILS_URL, headers=headers)
-            if response.status_code == 200:
-                emails = response.json()
-                cache.set(cache_key, emails, timeout=60 * 15)  # cache for 15 minutes
+            try:
+                emails = github.get_json(
+                    settings.GITHUB_OAUTH2_EMAILS_URL, self.access_token, f"github_etag:emails:{self.pk}"
+                )
+            except github.GitHubError:
+                return emails
+            cache.set(cache_key, emails, timeout=60 * 15)  # cache for 15 minutes
         return emails
 
+    def fetch_github_profile(self, max_wait=5):
+        """
+        Fetch the profile and emails from GitHub, revalidating the stored
+        copies, and prime the short-lived caches. Unlike the fetch helpers
+        above this raises ``GitHubError`` instead of falling back to the cache.
+        """
+        data = github.get_json(
+            settings.GITHUB_OAUTH2_USER_URL, self.access_token, f"github_etag:data:{self.pk}", max_wait
+        )
+        try:
+            emails = github.get_json(
+                settings.GITHUB_OAUTH2_EMAILS_URL, self.access_token, f"github_etag:emails:{self.pk}", max_wait
+            )
+        except github.RateLimited:
+            raise
+        except github.GitHubError:
+            emails = None
+        self.cache_github_profile(data, emails)
+        return data, emails
+
+    def apply_github_profile(self, github_data, emails=None):
+        """
+        Copy GitHub profile data and the public primary email onto the user,
+        without saving. Returns the names of the fields that changed.
+        """
+        values = {
+            "raw_data": github_data,
+            "name": github_data.get("name", self.name),
+            "uid": str(github_data.get("id", self.uid)),
+            "username": github_data.get("login", self.username),
+            "avatar_url": github_data.get("avatar_url", self.avatar_url),
+            "bio": github_data.get("bio", self.bio),
+        }
+        for email in emails or []:
+            if email.get("primary") and email.get("email") and email.get("visibility") == "public":
+                values["email"] = email.get("email")
+
+        changed = [field for field, value in values.items() if getattr(self, field) != value]
+        for field in changed:
+            setattr(self, field, values[field])
+        return changed
+
+    def cache_github_profile(self, github_data, emails=None):
+        """Prime the caches read by fetch_github_data and fetch_github_emails."""
+        values = {f"github_data:{self.pk}": github_data}
+        if emails is not None:
+            values[f"github_emails:{self.pk}"] = emails
+        cache.set_many(values, timeout=60 * 15)
+
     def update_user_profile(self, force_refresh=False):
         """
         Update the user's profile information from GitHub.
@@ -79,17 +137,8 @@ class User(AbstractUser):
         if not github_data:
             return
 
-        self.raw_data = github_data
-        self.name = github_data.get("name", self.name)
-        self.uid = str(github_data.get("id", self.uid))
-        self.username = github_data.get("login", self.username)
-        self.avatar_url = github_data.get("avatar_url", self.avatar_url)
-        self.bio = github_data.get("bio", self.bio)
-        self.save()
-
         emails = self.fetch_github_emails(force_refresh=force_refresh)
-        if emails:
-            for email in emails:
-                if email.get("primary") and email.get("email") and email.get("visibility") == "public":
-                    self.email = email.get("email")
-                    self.save()
+        changed = self.apply_github_profile(github_data, emails)
+        if changed:
+            self.github_synced_at = timezone.now()
+            self.save(update_fields=[*changed, "github_synced_at"])
@@ -1,3 +1,162 @@
-from django.test import TestCase
+import contextlib
+import io
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import github
+from .models import User
+
+
+class GitHubStub(BaseHTTPRequestHandler):
+    """Serves canned responses for the GitHub endpoints used at login."""
+
+    responses = {
+        "/login/oauth/access_token": {"access_token": "token-123"},
+        "/user": {"id": 42, "login": "octocat", "name": "The Octocat", "bio": "Hi", "avatar_url": "https://a/b.png"},
+        "/user/emails": [{"email": "octo@example.com", "primary": True, "visibility": "public"}],
+    }
+
+    etag = '"v1"'
+    hits = []
+
+    def do_GET(self):
+        if self.path != "/login/oauth/access_token" and self.headers["Authorization"] != "Bearer token-123":
+            return self.reply(401, {"message": "Bad credentials"})
+        if self.headers["If-None-Match"] == self.etag:
+            self.hits.append((self.path, 304))
+            self.send_response(304)
+            self.send_header("ETag", self.etag)
+            return self.end_headers()
+        self.hits.append((self.path, 200))
+        if self.path == "/broken":
+            self.send_response(200)
+            self.send_header("Content-Length", "7")
+            self.end_headers()
+            return self.wfile.write(b"<html>")
+        self.reply(200, self.responses.get(self.path, {}))
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.reply(200, self.responses[self.path])
+
+    def reply(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", self.etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class GitHubTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), GitHubStub)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{cls.server.server_port}"
+        cls.enterClassContext(
+            override_settings(
+                GITHUB_OAUTH2_TOKEN_URL=f"{base}/login/oauth/access_token",
+                GITHUB_OAUTH2_USER_URL=f"{base}/user",
+                GITHUB_OAUTH2_EMAILS_URL=f"{base}/user/emails",
+            )
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    async def test_callback_creates_and_logs_in_user(self):
+        clients = []
+        session = github.async_session
+
+        @contextlib.asynccontextmanager
+        async def recording_session():
+            async with session() as client:
+                clients.append(client)
+                yield client
+
+        with mock.patch.object(github, "async_session", recording_session):
+            response = await self.async_client.get(reverse("github_callback"), {"code": "abc"})
+        self.assertRedirects(response, reverse("home"), fetch_redirect_response=False)
+        # One client for the whole login, closed before the response
+        self.assertEqual(len(clients), 1)
+        self.assertTrue(clients[0].is_closed)
+
+        user = await User.objects.aget(uid="42")
+        self.assertEqual((user.username, user.name, user.email), ("octocat", "The Octocat", "octo@example.com"))
+        self.assertEqual(user.access_token, "token-123")
+        self.assertEqual(str(await self.async_client.session.aget("_auth_user_id")), str(user.pk))
+
+    def test_unchanged_login_writes_nothing(self):
+        self.client.get(reverse("github_callback"), {"code": "abc"})
+        self.client.logout()
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse("github_callback"), {"code": "abc"})
+        updates = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith('UPDATE "account_user"')]
+        # Only Django's own last_login bookkeeping
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"last_login"', updates[0])
+        self.assertNotIn('"access_token"', updates[0])
+
+    def test_profile_refresh_revalidates_with_etag(self):
+        cache.clear()
+        GitHubStub.hits.clear()
+        user = User.objects.create_user(username="octocat", uid="42", access_token="token-123")
+        user.update_user_profile()
+        # Nothing changed on GitHub, so nothing is written
+        with self.assertNumQueries(0):
+            user.update_user_profile(force_refresh=True)
+
+        self.assertEqual(GitHubStub.hits, [("/user", 200), ("/user/emails", 200), ("/user", 304), ("/user/emails", 304)])
+        user.refresh_from_db()
+        self.assertEqual((user.name, user.email), ("The Octocat", "octo@example.com"))
+
+    def test_unusable_responses_raise_github_error(self):
+        url = f"http://127.0.0.1:{self.server.server_port}/broken"
+        with self.assertRaises(github.GitHubError):
+            github.get_json(url, "token-123", "github:broken")
+
+        response = requests.Response()
+        response.headers["Retry-After"] = "Wed, 21 Oct 2015 07:28:00 GMT"
+        self.assertEqual(github.rate_limit_wait(response), 0)
+        response.headers["Retry-After"] = "soon"
+        self.assertIsNone(github.rate_limit_wait(response))
+        response.headers["Retry-After"] = "30"
+        self.assertEqual(github.rate_limit_wait(response), 30)
+
+    def test_refresh_command_skips_fresh_profiles(self):
+        stale = User.objects.create_user(username="old-login", uid="42", access_token="token-123")
+        fresh = User.objects.create_user(
+            username="fresh", uid="7", access_token="other", github_synced_at=timezone.now()
+        )
+        call_command("refresh_github_profiles", workers=2, stdout=io.StringIO())
+
+        stale.refresh_from_db()
+        self.assertEqual(stale.username, "octocat")
+        self.assertIsNotNone(stale.github_synced_at)
+        fresh.refresh_from_db()
+        self.assertEqual(fresh.username, "fresh")
+
+    async def test_callback_without_code_fails(self):
+        response = await self.async_client.get(reverse("github_callback"))
+        self.assertRedirects(response, reverse("login"), fetch_redirect_response=False)
+        self.assertFalse(await User.objects.aexists())
@@ -1,8 +1,11 @@
+import httpx
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.shortcuts import render, redirect, resolve_url
-import requests
-from django.contrib.auth import login, logout
+from django.contrib.auth import alogin, logout
 from django.contrib.auth.decorators import login_required
+from django.utils import timezone
+from . import github
 from .models import User
 from django.contrib import messages
 
@@ -28,47 +31,48 @@ def github_login(request):
     auth = f"{settings.GITHUB_OAUTH2_AUTH_URL}?client_id={settings.GITHUB_CLIENT_ID}&scope={'%20'.join(settings.GITHUB_OAUTH2_USER_SCOPE)}"
     return redirect(auth)
 
-def github_callback(request):
+async def github_callback(request):
     """
     Handle the GitHub OAuth2 callback.
+
+    Runs as an async view so waiting on GitHub does not hold a worker; the
+    profile and emails are fetched concurrently over one keep-alive client,
+    closed before the response is returned.
     """
     code = request.GET.get("code")
     if not code:
         messages.error(request, "GitHub login failed.")
         return redirect("login")
 
-    # Exchange the code for an access token
-    token_url = settings.GITHUB_OAUTH2_TOKEN_URL
-    data = {
-        "client_id": settings.GITHUB_CLIENT_ID,
-        "client_secret": settings.GITHUB_CLIENT_SECRET,
-        "code": code,
-    }
-    response = requests.post(token_url, data=data, headers={"Accept": "application/json"})
-    response_data = response.json()
-    access_token = response_data.get("access_token")
-
-    if not access_token:
+    try:
+        async with github.async_session():
+            access_token = await github.exchange_code(code)
+            user_data, emails = await github.fetch_profile(access_token)
+    except (github.GitHubError, httpx.HTTPError, ValueError):
         messages.error(request, "GitHub login failed.")
         return redirect("login")
 
-    # Use the access token to get the user's information
-    user_url = settings.GITHUB_OAUTH2_USER_URL
-    headers = {"Authorization": f"Bearer {access_token}"}
-    user_response = requests.get(user_url, headers=headers)
-    user_data = user_response.json()
-
     # Log the user in or create a new account
-    user, created = User.objects.get_or_create(
-        uid=user_data["id"],
+    user, created = await User.objects.aget_or_create(
+        uid=str(user_data["id"]),
+        defaults={"username": user_data.get("login", "")},
     )
-    user.access_token = access_token
-
     if created:
         user.set_unusable_password()
 
-    user.update_user_profile()
-    login(request, user)
+    changed = user.apply_github_profile(user_data, emails)
+    if user.access_token != access_token:
+        user.access_token = access_token
+        changed.append("access_token")
+    if created:
+        user.github_synced_at = timezone.now()
+        await user.asave()
+    elif changed:
+        # A returning user whose token and profile are unchanged costs no write
+        user.github_synced_at = timezone.now()
+        await user.asave(update_fields=[*changed, "github_synced_at"])
+    await sync_to_async(user.cache_github_profile)(user_data, emails)
+    await alogin(request, user)
     messages.success(request, "GitHub login successful.")
     return redirect("home")
 
@@ -79,5 +83,5 @@ def profile_view(request):
     Render the user's profile page.
     """
     games = request.user.webgames.all()
-    posts = request.user.posts.all()
+    posts = request.user.posts.listing()
     return render(request, "account/profile.html", {"games": games, "posts": posts})
\ No newline at end of file
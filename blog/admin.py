@@ -1,14 +1,22 @@
 from django.contrib import admin
-from .models import Post, Tag, Reaction, Comment
+from .models import Post, PostTag, Tag, Reaction, Comment
+
+
+class PostTagInline(admin.TabularInline):
+    model = PostTag
+    extra = 1
+    autocomplete_fields = ["tag"]
+    fields = ["tag"]
 
 
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
-    list_display = ("title", "author", "created_at", "updated_at", "webgame")
+    list_display = ("title", "author", "created_at", "updated_at", "webgame", "like_count", "dislike_count")
     search_fields = ("title", "content")
     list_filter = ("created_at", "updated_at", "author")
     prepopulated_fields = {"slug": ("title",)}
-    autocomplete_fields = ["tags", "reactions", "webgame"]
+    autocomplete_fields = ["webgame"]
+    inlines = [PostTagInline]
 
     def save_model(self, request, obj, form, change):
         obj.author = request.user
@@ -23,24 +31,24 @@ class PostAdmin(admin.ModelAdmin):
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
-    list_display = ("name", "slug")
+    list_display = ("name", "slug", "post_count")
     search_fields = ("name",)
     prepopulated_fields = {"slug": ("name",)}
 
 
 @admin.register(Comment)
 class CommentAdmin(admin.ModelAdmin):
-    list_display = ("post", "author", "created_at")
+    list_display = ("post", "author", "created_at", "like_count", "dislike_count")
     search_fields = ("content",)
-    autocomplete_fields = ["post", "author", "parent", "reactions"]
+    autocomplete_fields = ["post", "author", "parent"]
     list_filter = ("created_at", "author")
-    fields = ["post", "author", "content", "parent", "reactions"]
+    fields = ["post", "author", "content", "parent"]
     readonly_fields = ["created_at"]
 
 
 @admin.register(Reaction)
 class ReactionAdmin(admin.ModelAdmin):
-    list_display = ("user", "reaction_type")
+    list_display = ("user", "reaction_type", "post", "comment")
     search_fields = ("user__username", "reaction_type")
     list_filter = ("reaction_type",)
-    autocomplete_fields = ["user"]
+    autocomplete_fields = ["user", "post", "comment"]
@@ -0,0 +1,32 @@
+from core.hot_queries import SAMPLE_CURSOR, register
+from core.utils import keyset_queryset
+
+from .models import Post, PostTag, Tag
+from .views import COMMENTS_PAGE_SIZE, TAG_PAGE_SIZE
+
+
+@register("index: latest published posts")
+def latest_posts():
+    return Post.objects.published().listing()[:5]
+
+
+@register("published posts: page after cursor")
+def public_posts_page():
+    return keyset_queryset(Post.objects.published().listing(), SAMPLE_CURSOR)[:6]
+
+
+@register("post_list: author's posts")
+def author_posts():
+    return Post.objects.filter(author_id=1).listing()[:5]
+
+
+@register("post_detail: top-level comments after cursor")
+def comment_roots_page():
+    roots = Post(pk=1).comments.filter(parent__isnull=True).select_related("author")
+    return keyset_queryset(roots, SAMPLE_CURSOR)[: COMMENTS_PAGE_SIZE + 1]
+
+
+@register("tag_detail: posts with two tags after cursor")
+def tagged_posts_page():
+    links = PostTag.tagged_with([Tag(pk=1), Tag(pk=2)])
+    return keyset_queryset(links, SAMPLE_CURSOR, ("post_created_at", "post_id"))[: TAG_PAGE_SIZE + 1]
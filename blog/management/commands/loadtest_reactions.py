@@ -0,0 +1,66 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+
+from blog.models import Post
+
+User = get_user_model()
+PREFIX = "loadtest-reactor-"
+
+
+class Command(BaseCommand):
+    help = "Hammer a single post with concurrent reactions and report throughput."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=50, help="Number of concurrent reactors")
+        parser.add_argument("--clicks", type=int, default=20, help="Reactions sent by each user")
+        parser.add_argument("--workers", type=int, default=16, help="Worker threads")
+
+    def handle(self, *args, **options):
+        if min(options["users"], options["clicks"], options["workers"]) < 1:
+            raise CommandError("--users, --clicks and --workers must be at least 1.")
+
+        User.objects.bulk_create(
+            [User(username=f"{PREFIX}{i}") for i in range(options["users"])]
+        )
+        users = list(User.objects.filter(username__startswith=PREFIX))
+        post = Post.objects.create(
+            title=f"{PREFIX}{time.time_ns()}", content="Load test", author=users[0]
+        )
+
+        def click(user):
+            try:
+                for _ in range(options["clicks"]):
+                    post.react(user, random.choice(["like", "dislike"]))
+            finally:
+                connections.close_all()
+
+        try:
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+                list(pool.map(click, users))
+            elapsed = time.perf_counter() - start
+
+            total = options["users"] * options["clicks"]
+            post.refresh_from_db()
+            expected = (
+                post.reactions.filter(reaction_type="like").count(),
+                post.reactions.filter(reaction_type="dislike").count(),
+            )
+            self.stdout.write(
+                f"{total} reactions from {len(users)} users in {elapsed:.2f}s "
+                f"({total / elapsed:.0f} reactions/s)"
+            )
+            if (post.like_count, post.dislike_count) != expected:
+                raise CommandError(
+                    f"Counters drifted: stored {post.like_count}/{post.dislike_count}, "
+                    f"actual {expected[0]}/{expected[1]}"
+                )
+            self.stdout.write(self.style.SUCCESS(f"Counters consistent: {expected[0]} likes, {expected[1]} dislikes"))
+        finally:
+            close_old_connections()
+            User.objects.filter(username__startswith=PREFIX).delete()
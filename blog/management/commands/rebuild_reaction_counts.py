@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from blog.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = "Rebuild the denormalized like/dislike counters from the reaction rows."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            for model in (Post, Comment):
+                updated = model.rebuild_reaction_counts()
+                self.stdout.write(f"Rebuilt counters on {updated} {model._meta.verbose_name_plural}.")
+        self.stdout.write(self.style.SUCCESS("Reaction counters rebuilt."))
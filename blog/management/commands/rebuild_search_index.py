@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from blog.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Reindex every published post for full-text search."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} posts."))
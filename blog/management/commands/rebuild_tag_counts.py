@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from blog.models import PostTag, Tag
+
+
+class Command(BaseCommand):
+    help = "Rebuild the tag post counts and the post dates copied onto tag links."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            filled = PostTag.fill_post_dates(PostTag.objects.all())
+            updated = Tag.update_post_counts()
+        self.stdout.write(self.style.SUCCESS(f"Filled {filled} tag links, recounted {updated} tags."))
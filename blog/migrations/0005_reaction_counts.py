@@ -0,0 +1,59 @@
+# Generated by Django 5.2.5 on 2026-10-18 03:25
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_reaction_counts(apps, schema_editor):
+    Reaction = apps.get_model("blog", "Reaction")
+    for model_name, lookup in (("Post", "posts"), ("Comment", "comments")):
+        model = apps.get_model("blog", model_name)
+
+        def count(reaction_type):
+            reactions = (
+                Reaction.objects.filter(**{lookup: OuterRef("pk")}, reaction_type=reaction_type)
+                .order_by()
+                .values(lookup)
+                .annotate(total=Count("pk"))
+                .values("total")
+            )
+            return Coalesce(Subquery(reactions), 0)
+
+        model.objects.update(like_count=count("like"), dislike_count=count("dislike"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_post_webgame'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='dislike_count',
+            field=models.PositiveIntegerField(default=0, help_text='Number of dislikes'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0, help_text='Number of likes'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='dislike_count',
+            field=models.PositiveIntegerField(default=0, help_text='Number of dislikes'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0, help_text='Number of likes'),
+        ),
+        migrations.AlterField(
+            model_name='reaction',
+            name='reaction_type',
+            field=models.CharField(choices=[('like', 'Like'), ('dislike', 'Dislike')], db_index=True, help_text='Type of reaction', max_length=10),
+        ),
+        migrations.RunPython(backfill_reaction_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,112 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+
+def move_reactions_to_targets(apps, schema_editor):
+    Reaction = apps.get_model("blog", "Reaction")
+    targets = (("post", apps.get_model("blog", "Post")), ("comment", apps.get_model("blog", "Comment")))
+
+    # Point every reaction at the post or comment it was linked to, copying
+    # reactions that were shared by several targets.
+    reactions = Reaction.objects.in_bulk()
+    moved = {}
+    copies = []
+    for field, model in targets:
+        through = model.reactions.through
+        for target_id, reaction_id in through.objects.order_by("pk").values_list(f"{field}_id", "reaction_id"):
+            reaction = reactions[reaction_id]
+            if reaction_id not in moved:
+                setattr(reaction, f"{field}_id", target_id)
+                moved[reaction_id] = reaction
+            else:
+                copies.append(
+                    Reaction(
+                        user_id=reaction.user_id,
+                        reaction_type=reaction.reaction_type,
+                        **{f"{field}_id": target_id},
+                    )
+                )
+    Reaction.objects.bulk_update(moved.values(), ["post", "comment"], batch_size=500)
+    Reaction.objects.bulk_create(copies, batch_size=500)
+    Reaction.objects.filter(post__isnull=True, comment__isnull=True).delete()
+
+    for field, model in targets:
+        # Keep only the newest reaction per user and target
+        seen = set()
+        stale = []
+        rows = (
+            Reaction.objects.filter(**{f"{field}__isnull": False})
+            .order_by("-pk")
+            .values_list("pk", "user_id", f"{field}_id")
+        )
+        for pk, user_id, target_id in rows:
+            if (user_id, target_id) in seen:
+                stale.append(pk)
+            else:
+                seen.add((user_id, target_id))
+        Reaction.objects.filter(pk__in=stale).delete()
+
+        def count(reaction_type):
+            reactions = (
+                Reaction.objects.filter(**{field: OuterRef("pk")}, reaction_type=reaction_type)
+                .order_by()
+                .values(field)
+                .annotate(total=Count("pk"))
+                .values("total")
+            )
+            return Coalesce(Subquery(reactions), 0)
+
+        model.objects.update(like_count=count("like"), dislike_count=count("dislike"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_reaction_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reaction',
+            name='post',
+            field=models.ForeignKey(blank=True, help_text='Post that was reacted to', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='blog.post'),
+        ),
+        migrations.AddField(
+            model_name='reaction',
+            name='comment',
+            field=models.ForeignKey(blank=True, help_text='Comment that was reacted to', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='blog.comment'),
+        ),
+        migrations.RunPython(move_reactions_to_targets, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='post',
+            name='reactions',
+        ),
+        migrations.RemoveField(
+            model_name='comment',
+            name='reactions',
+        ),
+        migrations.AlterField(
+            model_name='reaction',
+            name='post',
+            field=models.ForeignKey(blank=True, help_text='Post that was reacted to', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reactions', to='blog.post'),
+        ),
+        migrations.AlterField(
+            model_name='reaction',
+            name='comment',
+            field=models.ForeignKey(blank=True, help_text='Comment that was reacted to', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reactions', to='blog.comment'),
+        ),
+        migrations.AddConstraint(
+            model_name='reaction',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='unique_post_reaction'),
+        ),
+        migrations.AddConstraint(
+            model_name='reaction',
+            constraint=models.UniqueConstraint(fields=('user', 'comment'), name='unique_comment_reaction'),
+        ),
+        migrations.AddConstraint(
+            model_name='reaction',
+            constraint=models.CheckConstraint(condition=Q(('comment__isnull', True), ('post__isnull', False)) | Q(('comment__isnull', False), ('post__isnull', True)), name='reaction_has_one_target'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.5 on 2026-10-18 03:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_comment_paths(apps, schema_editor):
+    Comment = apps.get_model("blog", "Comment")
+    parents = dict(Comment.objects.values_list("pk", "parent_id"))
+    paths = {}
+
+    def path_of(pk):
+        if pk not in paths:
+            parent_id = parents[pk]
+            paths[pk] = f"{path_of(parent_id) if parent_id else ''}{pk:010d}/"
+        return paths[pk]
+
+    comments = [Comment(pk=pk, path=path_of(pk)) for pk in parents]
+    Comment.objects.bulk_update(comments, ["path"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_reaction_targets'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, editable=False, help_text="Materialized path of ancestor ids, ending with this comment's id", max_length=1024),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'path'], name='blog_comment_post_path_idx'),
+        ),
+        migrations.RunPython(backfill_comment_paths, migrations.RunPython.noop),
+    ]
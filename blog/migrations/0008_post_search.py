@@ -0,0 +1,48 @@
+from django.db import migrations
+
+from blog.search import PostgresBackend, SQLiteBackend
+
+CREATE = {
+    "sqlite": [
+        "CREATE VIRTUAL TABLE blog_post_fts USING fts5("
+        "title, content, tags, tokenize='porter unicode61 remove_diacritics 2')",
+    ],
+    "postgresql": [
+        "CREATE TABLE blog_post_search ("
+        "post_id bigint PRIMARY KEY REFERENCES blog_post (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+        "content text NOT NULL, document tsvector NOT NULL)",
+        "CREATE INDEX blog_post_search_document_idx ON blog_post_search USING GIN (document)",
+    ],
+}
+DROP = {
+    "sqlite": ["DROP TABLE blog_post_fts"],
+    "postgresql": ["DROP TABLE blog_post_search"],
+}
+BACKENDS = {"sqlite": SQLiteBackend, "postgresql": PostgresBackend}
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for sql in CREATE.get(vendor, []):
+        schema_editor.execute(sql)
+    if vendor in BACKENDS:
+        backend = BACKENDS[vendor]()
+        Post = apps.get_model("blog", "Post")
+        for post in Post.objects.filter(is_published=True).prefetch_related("tags").iterator(chunk_size=500):
+            backend.index(post)
+
+
+def drop_search_index(apps, schema_editor):
+    for sql in DROP.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_comment_path'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
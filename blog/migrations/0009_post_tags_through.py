@@ -0,0 +1,69 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_tag_index(apps, schema_editor):
+    Post = apps.get_model("blog", "Post")
+    PostTag = apps.get_model("blog", "PostTag")
+    Tag = apps.get_model("blog", "Tag")
+
+    created_at = Post.objects.filter(pk=OuterRef("post")).values("created_at")
+    PostTag.objects.update(post_created_at=Subquery(created_at))
+
+    counts = (
+        PostTag.objects.filter(tag=OuterRef("pk"), post__is_published=True)
+        .order_by()
+        .values("tag")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    Tag.objects.update(post_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0008_post_search'),
+    ]
+
+    operations = [
+        # The existing auto-created table becomes an explicit through model
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='PostTag',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('post', models.ForeignKey(help_text='Tagged post', on_delete=django.db.models.deletion.CASCADE, related_name='tag_links', to='blog.post')),
+                        ('tag', models.ForeignKey(help_text='Tag on the post', on_delete=django.db.models.deletion.CASCADE, related_name='post_links', to='blog.tag')),
+                    ],
+                    options={
+                        'db_table': 'blog_post_tags',
+                        'unique_together': {('post', 'tag')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='post',
+                    name='tags',
+                    field=models.ManyToManyField(blank=True, help_text='Tags associated with the post', related_name='posts', through='blog.PostTag', to='blog.tag'),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='posttag',
+            name='post_created_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text="Copy of the post's creation date", null=True),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of published posts with this tag'),
+        ),
+        migrations.AddIndex(
+            model_name='posttag',
+            index=models.Index(fields=['tag', '-post_created_at', '-post'], name='blog_posttag_tag_created_idx'),
+        ),
+        migrations.RunPython(fill_tag_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-18 03:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0009_post_tags_through'),
+        ('webgame', '0013_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'parent', '-created_at', '-id'], name='blog_comment_post_parent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['-created_at', '-id'], name='blog_post_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-created_at', '-id'], name='blog_post_author_created_idx'),
+        ),
+    ]
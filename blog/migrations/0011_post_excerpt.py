@@ -0,0 +1,32 @@
+# Generated by Django 5.2.5 on 2026-10-18 03:54
+
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+
+def backfill_excerpts(apps, schema_editor):
+    Post = apps.get_model("blog", "Post")
+    posts = []
+    for post in Post.objects.only("content").iterator(chunk_size=500):
+        post.excerpt = Truncator(post.content).words(20)
+        posts.append(post)
+        if len(posts) == 500:
+            Post.objects.bulk_update(posts, ["excerpt"])
+            posts = []
+    Post.objects.bulk_update(posts, ["excerpt"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0010_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.TextField(blank=True, editable=False, help_text='First words of the content, shown in listings'),
+        ),
+        migrations.RunPython(backfill_excerpts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.5 on 2026-10-18 03:55
+
+from django.db import migrations, models
+
+
+def backfill_summaries(apps, schema_editor):
+    from blog.models import SUMMARY_FIELDS, summarize_markdown
+
+    Post = apps.get_model("blog", "Post")
+    posts = []
+    for post in Post.objects.only("content").iterator(chunk_size=500):
+        for field, value in summarize_markdown(post.content).items():
+            setattr(post, field, value)
+        posts.append(post)
+        if len(posts) == 500:
+            Post.objects.bulk_update(posts, SUMMARY_FIELDS)
+            posts = []
+    Post.objects.bulk_update(posts, SUMMARY_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0011_post_excerpt'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='reading_time',
+            field=models.PositiveIntegerField(default=1, editable=False, help_text='Estimated reading time in minutes'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='thumbnail',
+            field=models.CharField(blank=True, editable=False, help_text='Address of the first image in the content', max_length=2048),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of words in the rendered content'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='excerpt',
+            field=models.TextField(blank=True, editable=False, help_text='First words of the rendered content as plain text, shown in listings'),
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
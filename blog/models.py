@@ -1,11 +1,143 @@
-from django.db import models
-from django.utils.text import slugify
+import math
+import re
+from html import unescape
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Concat, Substr
+from django.utils.html import strip_tags
+from django.utils.text import Truncator, slugify
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from webgame.models import WebGame
+from core.utils import render_markdown
 NOT_ALLOWED_SLUGS = ["admin", "login", "logout", "register", "create", "edit", "delete"]
+# Width of one zero-padded comment id in Comment.path, plus its "/" separator
+PATH_SEGMENT_LENGTH = 11
+
 
-class Post(models.Model):
+class ReactionCountsMixin(models.Model):
+    """
+    Denormalized like/dislike counters for models that users react to.
+
+    Subclasses are the target of a ``Reaction`` foreign key whose
+    ``related_name`` is ``reactions``.
+    """
+    like_count = models.PositiveIntegerField(default=0, help_text="Number of likes")
+    dislike_count = models.PositiveIntegerField(default=0, help_text="Number of dislikes")
+
+    class Meta:
+        abstract = True
+
+    def adjust_reaction_counts(self, likes=0, dislikes=0):
+        """
+        Atomically shift the counters in the database and refresh them on self.
+        """
+        type(self).objects.filter(pk=self.pk).update(
+            like_count=F("like_count") + likes,
+            dislike_count=F("dislike_count") + dislikes,
+        )
+        self.refresh_from_db(fields=["like_count", "dislike_count"])
+
+    def react(self, user, reaction_type):
+        """
+        Toggle ``user``'s reaction and return the reaction now in place.
+
+        Reacting with the current type removes the reaction, reacting with the
+        other type switches it. The row is locked, written and the counters are
+        shifted in one transaction, so concurrent clicks cannot double count.
+        """
+        with transaction.atomic():
+            reaction = self.reactions.select_for_update().filter(user=user).first()
+            if reaction is None:
+                try:
+                    with transaction.atomic():
+                        self.reactions.create(user=user, reaction_type=reaction_type)
+                except IntegrityError:
+                    # A concurrent request inserted first, toggle against its row
+                    reaction = self.reactions.select_for_update().get(user=user)
+
+            previous = None
+            if reaction is not None:
+                previous = reaction.reaction_type
+                if previous == reaction_type:
+                    reaction.delete()
+                else:
+                    reaction.reaction_type = reaction_type
+                    reaction.save(update_fields=["reaction_type"])
+
+            current = None if previous == reaction_type else reaction_type
+            self.adjust_reaction_counts(
+                likes=(current == "like") - (previous == "like"),
+                dislikes=(current == "dislike") - (previous == "dislike"),
+            )
+        return current
+
+    @classmethod
+    def rebuild_reaction_counts(cls):
+        """
+        Recompute every counter from the reaction rows in a single UPDATE.
+        """
+        lookup = cls._meta.get_field("reactions").field.name
+
+        def count(reaction_type):
+            reactions = (
+                Reaction.objects.filter(**{lookup: OuterRef("pk")}, reaction_type=reaction_type)
+                .order_by()
+                .values(lookup)
+                .annotate(total=Count("pk"))
+                .values("total")
+            )
+            return Coalesce(Subquery(reactions), 0)
+
+        return cls.objects.update(like_count=count("like"), dislike_count=count("dislike"))
+
+
+EXCERPT_WORDS = 20
+WORDS_PER_MINUTE = 200
+THUMBNAIL_MAX_LENGTH = 2048
+
+# First image of a rendered post, skipping inline emoji
+FIRST_IMAGE_RE = re.compile(r'<img\b(?![^>]*\bclass="[^"]*\b(?:emojione|twemoji|gemoji)\b)[^>]*\bsrc="([^"]+)"')
+
+# Columns a post card needs, so listings never load the markdown body
+LISTING_FIELDS = (
+    "title", "slug", "excerpt", "reading_time", "thumbnail", "created_at", "is_published", "author__username",
+)
+SUMMARY_FIELDS = ("excerpt", "word_count", "reading_time", "thumbnail")
+
+
+def summarize_markdown(content):
+    """
+    Return the listing metadata of a post body, keyed by ``SUMMARY_FIELDS``:
+    a plain-text excerpt, the word count, the reading time in minutes and
+    the address of the first image.
+    """
+    html = render_markdown(content)
+    words = unescape(strip_tags(html)).split()
+    image = FIRST_IMAGE_RE.search(html)
+    thumbnail = unescape(image.group(1)) if image else ""
+    return {
+        "excerpt": Truncator(" ".join(words)).words(EXCERPT_WORDS),
+        "word_count": len(words),
+        "reading_time": max(1, math.ceil(len(words) / WORDS_PER_MINUTE)),
+        # Too long to store is as good as none
+        "thumbnail": thumbnail if len(thumbnail) <= THUMBNAIL_MAX_LENGTH else "",
+    }
+
+
+class PostQuerySet(models.QuerySet):
+    def published(self):
+        return self.filter(is_published=True)
+
+    def listing(self):
+        """
+        Only the columns shown in post listings, with the author joined in.
+        """
+        return self.select_related("author").only(*LISTING_FIELDS)
+
+
+class Post(ReactionCountsMixin):
     """
     Model to represent a blog post.
     """
@@ -15,11 +147,17 @@ class Post(models.Model):
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='posts', help_text="Author of the post")
     created_at = models.DateTimeField(auto_now_add=True, help_text="Creation date and time of the post")
     updated_at = models.DateTimeField(auto_now=True, help_text="Last update date and time of the post")
-    tags = models.ManyToManyField('Tag', blank=True, related_name='posts', help_text="Tags associated with the post")
-    reactions = models.ManyToManyField('Reaction', blank=True, related_name='posts', help_text="Reactions to the post")
+    tags = models.ManyToManyField('Tag', blank=True, through='PostTag', related_name='posts', help_text="Tags associated with the post")
     webgame = models.ForeignKey(WebGame, on_delete=models.SET_NULL, related_name='posts', help_text="Web game associated with the post", null=True, blank=True)
 
     is_published = models.BooleanField(default=True, help_text="Whether the post is published or not")
+    excerpt = models.TextField(blank=True, editable=False, help_text="First words of the rendered content as plain text, shown in listings")
+    word_count = models.PositiveIntegerField(default=0, editable=False, help_text="Number of words in the rendered content")
+    reading_time = models.PositiveIntegerField(default=1, editable=False, help_text="Estimated reading time in minutes")
+    thumbnail = models.CharField(max_length=THUMBNAIL_MAX_LENGTH, blank=True, editable=False, help_text="Address of the first image in the content")
+
+    objects = PostQuerySet.as_manager()
+
     def __str__(self):
         return self.title
 
@@ -27,12 +165,29 @@ class Post(models.Model):
         verbose_name = "Blog Post"
         verbose_name_plural = "Blog Posts"
         ordering = ["-created_at"]
+        indexes = [
+            # Public listings, newest first. Partial, because a bare boolean
+            # filter ("WHERE is_published") can't seek into a composite index
+            models.Index(fields=["-created_at", "-id"], condition=Q(is_published=True), name="blog_post_published_idx"),
+            # The author's own list
+            models.Index(fields=["author", "-created_at", "-id"], name="blog_post_author_created_idx"),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "content" in update_fields:
+            # Rendering also warms the cache, so the first page view is a lookup
+            self.summarize()
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, *SUMMARY_FIELDS}
         super().save(*args, **kwargs)
 
+    def summarize(self):
+        for field, value in summarize_markdown(self.content).items():
+            setattr(self, field, value)
+
     def clean(self):
         if self.slug in NOT_ALLOWED_SLUGS:
             raise ValidationError(f"Slug '{self.slug}' is not allowed.")
@@ -43,6 +198,7 @@ class Tag(models.Model):
     """
     name = models.CharField(max_length=50, unique=True, help_text="Name of the tag")
     slug = models.SlugField(max_length=50, unique=True, help_text="Slug for the tag")
+    post_count = models.PositiveIntegerField(default=0, editable=False, help_text="Number of published posts with this tag")
 
     def __str__(self):
         return self.name
@@ -57,8 +213,73 @@ class Tag(models.Model):
             self.slug = slugify(self.name)
         super().save(*args, **kwargs)
 
+    @classmethod
+    def update_post_counts(cls, tag_ids=None):
+        """
+        Recompute ``post_count`` from the tag links in a single UPDATE,
+        limited to ``tag_ids`` when given.
+        """
+        counts = (
+            PostTag.objects.filter(tag=OuterRef("pk"), post__is_published=True)
+            .order_by()
+            .values("tag")
+            .annotate(total=Count("pk"))
+            .values("total")
+        )
+        tags = cls.objects.all() if tag_ids is None else cls.objects.filter(pk__in=tag_ids)
+        return tags.update(post_count=Coalesce(Subquery(counts), 0))
+
 
-class Comment(models.Model):
+class PostTag(models.Model):
+    """
+    Link between a post and a tag. The post's creation date is copied in so
+    a tag page is one ordered range scan of the (tag, date) index.
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='tag_links', help_text="Tagged post")
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='post_links', help_text="Tag on the post")
+    post_created_at = models.DateTimeField(null=True, blank=True, editable=False, help_text="Copy of the post's creation date")
+
+    class Meta:
+        db_table = "blog_post_tags"
+        unique_together = [("post", "tag")]
+        indexes = [
+            models.Index(fields=["tag", "-post_created_at", "-post"], name="blog_posttag_tag_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.post} - {self.tag}"
+
+    def save(self, *args, **kwargs):
+        # Links added through Post.tags are bulk-inserted and filled by the
+        # m2m_changed handler instead
+        if self.post_created_at is None:
+            self.post_created_at = self.post.created_at
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def fill_post_dates(cls, links):
+        """Copy the post creation dates onto ``links`` that are missing them."""
+        created_at = Post.objects.filter(pk=OuterRef("post")).values("created_at")
+        return links.filter(post_created_at__isnull=True).update(post_created_at=Subquery(created_at))
+
+    @classmethod
+    def tagged_with(cls, tags):
+        """
+        Links to published posts carrying every one of ``tags``, walking the
+        first tag's index range and probing the (post, tag) unique index for
+        the others. Links whose post date is not filled in yet are left out,
+        they could not be paged past.
+        """
+        first, *others = tags
+        links = cls.objects.filter(tag=first, post_created_at__isnull=False, post__is_published=True)
+        for tag in others:
+            links = links.filter(Exists(cls.objects.filter(post=OuterRef("post"), tag=tag)))
+        return links.select_related("post__author").only(
+            "post_created_at", "post", *(f"post__{field}" for field in LISTING_FIELDS)
+        )
+
+
+class Comment(ReactionCountsMixin):
     """
     Model to represent a comment on a blog post.
     """
@@ -67,31 +288,100 @@ class Comment(models.Model):
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='comments', help_text="Author of the comment")
     content = models.TextField(help_text="Content of the comment")
     created_at = models.DateTimeField(auto_now_add=True, help_text="Creation date and time of the comment")
-    reactions = models.ManyToManyField('Reaction', blank=True, related_name='comments', help_text="Reactions to the comment")
+    path = models.CharField(max_length=1024, blank=True, editable=False, help_text="Materialized path of ancestor ids, ending with this comment's id")
 
     def __str__(self):
         return f"Comment by {self.author} on {self.post}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # The path ends with our own id, so it can only be built once saved
+        path = f"{self.parent.path if self.parent_id else ''}{self.pk:010d}/"
+        if path != self.path:
+            old_path, self.path = self.path, path
+            Comment.objects.filter(pk=self.pk).update(path=path)
+            if old_path:
+                # Moved to another parent, re-root the whole subtree
+                Comment.objects.filter(
+                    post_id=self.post_id, path__gt=old_path, path__lt=old_path[:-1] + "0"
+                ).update(path=Concat(models.Value(path), Substr("path", len(old_path) + 1)))
+
+    def descendants(self):
+        """
+        All replies under this comment, at any depth, as one indexed range query.
+        """
+        # Paths only use digits and "/", so every path under "…/12/" sorts
+        # before "…/120" and the subtree is a contiguous range of the index
+        return Comment.objects.filter(
+            post_id=self.post_id, path__gt=self.path, path__lt=self.path[:-1] + "0"
+        )
+
+    @classmethod
+    def thread(cls, post):
+        """
+        All comments of ``post`` in thread order: each comment directly
+        followed by its replies, oldest first.
+        """
+        return cls.objects.filter(post=post).select_related("author").order_by("path")
+
+    @classmethod
+    def reply_counts(cls, post, roots=None):
+        """
+        Return ``{top-level comment id: number of replies under it}``,
+        optionally limited to the given top-level comments.
+        """
+        rows = (
+            cls.objects.filter(post=post, parent__isnull=False)
+            .annotate(root=Substr("path", 1, PATH_SEGMENT_LENGTH))
+        )
+        if roots is not None:
+            rows = rows.filter(root__in=[root.path for root in roots])
+        rows = rows.order_by().values("root").annotate(total=Count("pk"))
+        return {int(row["root"][:-1]): row["total"] for row in rows}
+
+    @staticmethod
+    def build_tree(comments):
+        """
+        Link ``comments`` into a tree in memory.
+
+        Every comment gets a ``children`` list, in the order given. Returns the
+        comments whose parent is not part of ``comments``.
+        """
+        comments = list(comments)
+        by_id = {comment.pk: comment for comment in comments}
+        roots = []
+        for comment in comments:
+            comment.children = []
+        for comment in comments:
+            parent = by_id.get(comment.parent_id)
+            if parent is None:
+                roots.append(comment)
+            else:
+                parent.children.append(comment)
+        return roots
+
     def get_tree(self):
         """
         Get the comment thread tree.
         """
-        tree = []
-        if self.replies.exists():
-            for reply in self.replies.all():
-                tree.append(reply)
-                tree.extend(reply.get_tree())
-        return tree
+        return list(self.descendants().select_related("author").order_by("path"))
 
     class Meta:
         verbose_name = "Comment"
         verbose_name_plural = "Comments"
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["post", "path"], name="blog_comment_post_path_idx"),
+            # A post's top-level comments (parent IS NULL), newest first
+            models.Index(fields=["post", "parent", "-created_at", "-id"], name="blog_comment_post_parent_idx"),
+        ]
 
 
 class Reaction(models.Model):
     """
     Model to represent a reaction (like/dislike) on a blog post or comment.
+
+    Each user has at most one reaction per post and per comment.
     """
     REACTION_CHOICES = [
         ('like', 'Like'),
@@ -99,9 +389,20 @@ class Reaction(models.Model):
     ]
 
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='reactions', help_text="User who made the reaction")
-    reaction_type = models.CharField(max_length=10, choices=REACTION_CHOICES, help_text="Type of reaction")
+    reaction_type = models.CharField(max_length=10, choices=REACTION_CHOICES, db_index=True, help_text="Type of reaction")
+    post = models.ForeignKey(Post, null=True, blank=True, on_delete=models.CASCADE, related_name='reactions', help_text="Post that was reacted to")
+    comment = models.ForeignKey(Comment, null=True, blank=True, on_delete=models.CASCADE, related_name='reactions', help_text="Comment that was reacted to")
 
     class Meta:
         verbose_name = "Reaction"
         verbose_name_plural = "Reactions"
         ordering = ["-id"]
+        constraints = [
+            # NULLs are distinct, so these only bite on the target that is set
+            models.UniqueConstraint(fields=["user", "post"], name="unique_post_reaction"),
+            models.UniqueConstraint(fields=["user", "comment"], name="unique_comment_reaction"),
+            models.CheckConstraint(
+                condition=Q(post__isnull=False, comment__isnull=True) | Q(post__isnull=True, comment__isnull=False),
+                name="reaction_has_one_target",
+            ),
+        ]
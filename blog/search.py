@@ -0,0 +1,212 @@
+"""
+Full-text search over posts.
+
+Each database gets the inverted index it supports best: an FTS5 table on
+SQLite and a weighted tsvector with a GIN index on PostgreSQL. Other
+databases fall back to a slow ``icontains`` scan. Titles rank above tag
+names, which rank above the body.
+"""
+import re
+from dataclasses import dataclass
+
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape, strip_tags
+from django.utils.safestring import mark_safe
+
+from core.utils import render_markdown
+
+# Snippet highlight markers, swapped for <mark> once the text is escaped
+_HIT_START, _HIT_END = "\x02", "\x03"
+SNIPPET_WORDS = 24
+
+
+@dataclass
+class SearchHit:
+    post_id: int
+    rank: float
+    snippet: str
+
+
+def document(post):
+    """The plain-text ``(title, content, tags)`` indexed for ``post``."""
+    content = strip_tags(render_markdown(post.content))
+    tags = " ".join(tag.name for tag in post.tags.all())
+    return post.title, content, tags
+
+
+def query_terms(query):
+    return re.findall(r"\w+", query.lower())[:16]
+
+
+def highlight(snippet):
+    """Escape a snippet and turn the backend's hit markers into <mark> tags."""
+    return mark_safe(
+        escape(snippet).replace(_HIT_START, "<mark>").replace(_HIT_END, "</mark>")
+    )
+
+
+class SQLiteBackend:
+    """FTS5 index in ``blog_post_fts``, keyed by post id as its rowid."""
+
+    def index(self, post):
+        title, content, tags = document(post)
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM blog_post_fts WHERE rowid = %s", [post.pk])
+            cursor.execute(
+                "INSERT INTO blog_post_fts (rowid, title, content, tags) VALUES (%s, %s, %s, %s)",
+                [post.pk, title, content, tags],
+            )
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM blog_post_fts WHERE rowid = %s", [post_id])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM blog_post_fts")
+
+    def search(self, query, limit, offset):
+        terms = query_terms(query)
+        if not terms:
+            return []
+        # Quoted terms can't inject FTS5 syntax. No prefix queries: a short
+        # prefix expands to thousands of terms, stemming covers word forms
+        match = " ".join(f'"{term}"' for term in terms)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT rowid, bm25(blog_post_fts, 10.0, 1.0, 5.0) AS rank,
+                       snippet(blog_post_fts, 1, '{_HIT_START}', '{_HIT_END}', '…', {SNIPPET_WORDS})
+                FROM blog_post_fts
+                WHERE blog_post_fts MATCH %s
+                ORDER BY rank
+                LIMIT %s OFFSET %s
+                """,
+                [match, limit, offset],
+            )
+            return [SearchHit(*row) for row in cursor.fetchall()]
+
+
+class PostgresBackend:
+    """Weighted tsvector in ``blog_post_search`` with a GIN index."""
+
+    def index(self, post):
+        title, content, tags = document(post)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO blog_post_search (post_id, content, document)
+                VALUES (%s, %s, setweight(to_tsvector('english', %s), 'A')
+                              || setweight(to_tsvector('english', %s), 'B')
+                              || setweight(to_tsvector('english', %s), 'C'))
+                ON CONFLICT (post_id) DO UPDATE
+                SET content = EXCLUDED.content, document = EXCLUDED.document
+                """,
+                [post.pk, content, title, tags, content],
+            )
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM blog_post_search WHERE post_id = %s", [post_id])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM blog_post_search")
+
+    def search(self, query, limit, offset):
+        terms = query_terms(query)
+        if not terms:
+            return []
+        tsquery = " & ".join(terms)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT post_id, ts_rank_cd(document, q) AS rank,
+                       ts_headline('english', content, q,
+                                   'StartSel={_HIT_START}, StopSel={_HIT_END}, MaxWords={SNIPPET_WORDS}')
+                FROM blog_post_search, to_tsquery('english', %s) q
+                WHERE document @@ q
+                ORDER BY rank DESC
+                LIMIT %s OFFSET %s
+                """,
+                [tsquery, limit, offset],
+            )
+            return [SearchHit(*row) for row in cursor.fetchall()]
+
+
+class ScanBackend:
+    """Unindexed fallback for databases without a supported full-text index."""
+
+    def index(self, post):
+        pass
+
+    def remove(self, post_id):
+        pass
+
+    def clear(self):
+        pass
+
+    def search(self, query, limit, offset):
+        from .models import Post
+
+        terms = query_terms(query)
+        if not terms:
+            return []
+        posts = Post.objects.filter(is_published=True)
+        for term in terms:
+            posts = posts.filter(Q(title__icontains=term) | Q(content__icontains=term))
+        return [
+            SearchHit(post.pk, 0.0, " ".join(post.content.split()[:SNIPPET_WORDS]))
+            for post in posts.only("pk", "content")[offset:offset + limit]
+        ]
+
+
+BACKENDS = {"sqlite": SQLiteBackend, "postgresql": PostgresBackend}
+
+
+def get_backend():
+    return BACKENDS.get(connection.vendor, ScanBackend)()
+
+
+def index_post(post):
+    """Add or refresh ``post`` in the index; unpublished posts are left out."""
+    backend = get_backend()
+    if post.is_published:
+        backend.index(post)
+    else:
+        backend.remove(post.pk)
+
+
+def remove_post(post_id):
+    get_backend().remove(post_id)
+
+
+def rebuild_index():
+    """Reindex every post, e.g. after a bulk import that skipped signals."""
+    from .models import Post
+
+    get_backend().clear()
+    count = 0
+    for post in Post.objects.prefetch_related("tags").iterator(chunk_size=500):
+        index_post(post)
+        count += post.is_published
+    return count
+
+
+def search_posts(query, limit=20, offset=0):
+    """
+    Return published posts matching ``query``, best match first, each with
+    ``rank`` and an HTML-safe ``snippet`` attribute.
+    """
+    from .models import Post
+
+    hits = get_backend().search(query, limit, offset)
+    posts = Post.objects.filter(pk__in=[hit.post_id for hit in hits], is_published=True).listing().in_bulk()
+    results = []
+    for hit in hits:
+        post = posts.get(hit.post_id)
+        if post is not None:
+            post.rank, post.snippet = hit.rank, highlight(hit.snippet)
+            results.append(post)
+    return results
@@ -0,0 +1,130 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from core.cache import invalidate_cache_tags
+
+from . import search
+from .models import Comment, Post, PostTag, Reaction, Tag
+
+
+def invalidate_post_page(instance):
+    """
+    Invalidate the cached detail page of ``instance.post``, if it still exists.
+    """
+    if type(instance).post.is_cached(instance):
+        slug = instance.post.slug
+    else:
+        slug = Post.objects.filter(pk=instance.post_id).values_list("slug", flat=True).first()
+    if slug:
+        invalidate_cache_tags(f"post:{slug}")
+
+
+@receiver([post_save, post_delete], sender=Post)
+def post_changed(sender, instance, **kwargs):
+    invalidate_cache_tags("posts", f"post:{instance.slug}")
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+    search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.remove_post(instance.pk)
+
+
+def reindex_posts(post_ids):
+    for post in Post.objects.filter(pk__in=post_ids).prefetch_related("tags"):
+        search.index_post(post)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def post_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear" and reverse:
+        # A cleared tag no longer knows its posts once the rows are gone
+        instance._search_post_ids = list(instance.posts.values_list("pk", flat=True))
+    elif action in ("post_add", "post_remove", "post_clear"):
+        if not reverse:
+            search.index_post(instance)
+        else:
+            reindex_posts(instance._search_post_ids if action == "post_clear" else pk_set)
+
+
+@receiver(m2m_changed, sender=PostTag)
+def tag_links_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep the copied post dates, the tag counts and cached pages current."""
+    if action == "pre_clear":
+        instance._cleared_tag_ids = [instance.pk] if reverse else list(instance.tags.values_list("pk", flat=True))
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if action == "post_add":
+        links = PostTag.objects.filter(tag=instance, post__in=pk_set) if reverse else instance.tag_links.filter(tag__in=pk_set)
+        PostTag.fill_post_dates(links)
+    if action == "post_clear":
+        Tag.update_post_counts(instance._cleared_tag_ids)
+    else:
+        Tag.update_post_counts([instance.pk] if reverse else pk_set)
+    invalidate_cache_tags("posts", *([] if reverse else [f"post:{instance.slug}"]))
+
+
+@receiver([post_save, post_delete], sender=PostTag)
+def tag_link_saved(sender, instance, **kwargs):
+    """
+    Links saved one by one, e.g. by the admin inline, skip ``m2m_changed``
+    and need the same bookkeeping.
+    """
+    Tag.update_post_counts([instance.tag_id])
+    reindex_posts([instance.post_id])
+    invalidate_cache_tags("posts")
+    invalidate_post_page(instance)
+
+
+@receiver(post_save, sender=Post)
+def recount_post_tags(sender, instance, created, **kwargs):
+    # Publishing or unpublishing changes what the tags count
+    if not created:
+        Tag.update_post_counts(instance.tag_links.values("tag"))
+
+
+@receiver(pre_delete, sender=Post)
+def remember_post_tags(sender, instance, **kwargs):
+    instance._deleted_tag_ids = list(instance.tag_links.values_list("tag_id", flat=True))
+
+
+@receiver(post_delete, sender=Post)
+def recount_deleted_post_tags(sender, instance, **kwargs):
+    Tag.update_post_counts(instance._deleted_tag_ids)
+
+
+@receiver(pre_delete, sender=Tag)
+def remember_posts_of_deleted_tag(sender, instance, **kwargs):
+    instance._search_post_ids = list(instance.posts.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    reindex_posts(instance._search_post_ids)
+
+
+@receiver(post_save, sender=Tag)
+def tag_changed(sender, instance, created, **kwargs):
+    if not created:
+        reindex_posts(instance.posts.values_list("pk", flat=True))
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    invalidate_post_page(instance)
+
+
+@receiver([post_save, post_delete], sender=Reaction)
+def reaction_changed(sender, instance, **kwargs):
+    if instance.post_id:
+        invalidate_post_page(instance)
+    elif instance.comment_id:
+        comment = Comment.objects.filter(pk=instance.comment_id).only("post_id").first()
+        if comment:
+            invalidate_post_page(comment)
@@ -1,3 +1,325 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
+from .models import Comment, Post, PostTag, Reaction, Tag
+from .search import search_posts
+
+User = get_user_model()
+
+
+class PostDetailTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="author", uid="1")
+        cls.reader = User.objects.create_user(username="reader", uid="2")
+        cls.post = Post.objects.create(title="Hello", content="# Hello", author=cls.author)
+        cls.post.tags.add(Tag.objects.create(name="django"), Tag.objects.create(name="python"))
+        cls.post.react(cls.author, "like")
+        cls.post.react(cls.reader, "dislike")
+        for i in range(5):
+            comment = Comment.objects.create(post=cls.post, author=cls.reader, content=f"Comment {i}")
+            for depth in range(3):
+                comment = Comment.objects.create(
+                    post=cls.post, author=cls.author, parent=comment, content=f"Reply {depth}"
+                )
+
+    def setUp(self):
+        cache.clear()
+
+    def assertMaxQueries(self, limit, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(ctx.captured_queries), limit, [q["sql"] for q in ctx.captured_queries])
+        return response
+
+    def test_anonymous_query_count(self):
+        response = self.assertMaxQueries(4, reverse("post_detail", args=[self.post.slug]))
+        self.assertEqual(response.context["post_like_count"], 1)
+        self.assertEqual(response.context["post_dislike_count"], 1)
+        self.assertFalse(response.context["user_liked"])
+        self.assertEqual(len(response.context["comments"]), 5)
+        self.assertEqual([c.reply_count for c in response.context["comments"]], [3] * 5)
+        self.assertNotContains(response, "Reply 0")
+
+    def test_authenticated_query_count(self):
+        self.client.force_login(self.reader)
+        response = self.assertMaxQueries(7, reverse("post_detail", args=[self.post.slug]))
+        self.assertFalse(response.context["user_liked"])
+        self.assertTrue(response.context["user_disliked"])
+
+    def test_cached_page_has_no_csrf_token(self):
+        url = reverse("post_detail", args=[self.post.slug])
+        first, second = Client().get(url), Client().get(url)
+        self.assertEqual(first.content, second.content)
+        self.assertContains(second, '"X-CSRFToken": ""')
+        self.assertNotIn("csrftoken", first.cookies)
+
+    def test_anonymous_page_cache_is_invalidated(self):
+        url = reverse("post_detail", args=[self.post.slug])
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.assertContains(self.client.get(url), "Comment 4")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(post=self.post, author=self.reader, content="Fresh comment")
+        self.assertContains(self.client.get(url), "Fresh comment")
+
+        self.client.force_login(self.reader)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("post_react", args=[self.post.pk]),
+                {"reaction_type": "like"},
+                content_type="application/json",
+            )
+        self.client.logout()
+        self.assertContains(self.client.get(url), '<span id="like-count">2</span>')
+
+
+class PostCommentsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="reader", uid="1")
+        cls.post = Post.objects.create(title="Hello", content="Hello", author=cls.user)
+        cls.roots = [
+            Comment.objects.create(post=cls.post, author=cls.user, content=f"Comment {i}")
+            for i in range(25)
+        ]
+        reply = Comment.objects.create(post=cls.post, author=cls.user, parent=cls.roots[0], content="Reply")
+        Comment.objects.create(post=cls.post, author=cls.user, parent=reply, content="Nested")
+
+    def get(self, **params):
+        return self.client.get(reverse("post_comments", args=[self.post.pk]), params).json()
+
+    def test_top_level_pages(self):
+        first = self.get()
+        self.assertEqual(len(first["comments"]), 20)
+        self.assertEqual(first["comments"][0]["content"], "Comment 24")
+        second = self.get(cursor=first["next_cursor"])
+        self.assertEqual([c["content"] for c in second["comments"]], [f"Comment {i}" for i in range(4, -1, -1)])
+        self.assertIsNone(second["next_cursor"])
+        self.assertEqual(second["comments"][-1]["reply_count"], 2)
+
+    def test_replies_are_nested(self):
+        with self.assertNumQueries(3):
+            data = self.get(parent=self.roots[0].pk)
+        [reply] = data["comments"]
+        self.assertEqual(reply["content"], "Reply")
+        self.assertEqual([c["content"] for c in reply["children"]], ["Nested"])
+
+
+class CommentTreeTests(TestCase):
+    def test_materialized_path_queries(self):
+        user = User.objects.create_user(username="reader", uid="1")
+        post = Post.objects.create(title="Hello", content="Hello", author=user)
+        root = Comment.objects.create(post=post, author=user, content="root")
+        first = Comment.objects.create(post=post, author=user, parent=root, content="first")
+        nested = Comment.objects.create(post=post, author=user, parent=first, content="nested")
+        second = Comment.objects.create(post=post, author=user, parent=root, content="second")
+
+        other = Comment.objects.create(post=post, author=user, content="other")
+
+        with self.assertNumQueries(1):
+            tree = root.get_tree()
+        self.assertEqual(tree, [first, nested, second])
+        self.assertEqual(Comment.reply_counts(post), {root.pk: 3})
+        self.assertEqual(list(Comment.thread(post)), [root, first, nested, second, other])
+
+        # Moving a reply carries its subtree along
+        first.parent = other
+        first.save()
+        self.assertEqual(Comment.reply_counts(post), {root.pk: 1, other.pk: 2})
+
+
+class PostReactTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="reader", uid="1")
+        cls.post = Post.objects.create(title="Hello", content="Hello", author=cls.user)
+
+    def react(self, reaction_type):
+        return self.client.post(
+            reverse("post_react", args=[self.post.pk]),
+            {"reaction_type": reaction_type},
+            content_type="application/json",
+        ).json()
+
+    def test_reactions_toggle(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.react("like"), {"likes": 1, "dislikes": 0, "reaction": "like"})
+        self.assertEqual(self.react("dislike"), {"likes": 0, "dislikes": 1, "reaction": "dislike"})
+        self.assertEqual(self.react("dislike"), {"likes": 0, "dislikes": 0, "reaction": None})
+        self.assertFalse(Reaction.objects.exists())
+
+    def test_react_runs_constant_queries(self):
+        self.client.force_login(self.user)
+        self.react("like")
+        # Session, user and post lookups, then the reaction change and the
+        # counter UPDATE inside a savepoint. Creating adds the nested
+        # savepoint that guards the unique insert.
+        for reaction_type, expected in (("dislike", 9), ("dislike", 9), ("like", 11)):
+            with self.assertNumQueries(expected):
+                self.react(reaction_type)
+
+    def test_rebuild_reaction_counts(self):
+        self.post.react(self.user, "dislike")
+        Post.objects.filter(pk=self.post.pk).update(like_count=5, dislike_count=5)
+        Post.rebuild_reaction_counts()
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.dislike_count), (0, 1))
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="reader", uid="1")
+        cls.in_title = Post.objects.create(title="Pathfinding in games", content="A* explained", author=cls.user)
+        cls.in_body = Post.objects.create(
+            title="Notes", content="Some words first, then **pathfinding** <script>x</script>", author=cls.user
+        )
+        cls.draft = Post.objects.create(
+            title="Pathfinding draft", content="Unfinished", author=cls.user, is_published=False
+        )
+
+    def test_ranked_results_with_snippets(self):
+        results = search_posts("pathfind")
+        self.assertEqual(results, [self.in_title, self.in_body])
+        self.assertIn("<mark>pathfinding</mark>", results[1].snippet)
+        self.assertNotIn("<script>", results[1].snippet)
+
+        response = self.client.get(reverse("post_search"), {"q": "pathfinding"})
+        self.assertContains(response, "Pathfinding in games")
+        self.assertNotContains(response, "Pathfinding draft")
+
+    def test_index_follows_tags_and_deletes(self):
+        tag = Tag.objects.create(name="algorithms")
+        self.in_body.tags.add(tag)
+        self.assertEqual(search_posts("algorithms"), [self.in_body])
+
+        tag.name = "graphs"
+        tag.save()
+        self.assertEqual(search_posts("algorithms"), [])
+        self.assertEqual(search_posts("graphs"), [self.in_body])
+
+        self.in_body.delete()
+        self.assertEqual(search_posts("graphs"), [])
+        self.assertEqual(search_posts("  !! "), [])
+
+    def test_page_out_of_range(self):
+        response = self.client.get(reverse("post_search"), {"q": "pathfinding", "page": "9" * 20})
+        self.assertEqual(response.status_code, 404)
+
+
+class TagPageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="reader", uid="1")
+        cls.python = Tag.objects.create(name="python")
+        cls.django = Tag.objects.create(name="django")
+        cls.posts = [
+            Post.objects.create(title=f"Post {i}", content="Hello", author=cls.user) for i in range(12)
+        ]
+        for post in cls.posts:
+            post.tags.add(cls.python)
+        for post in cls.posts[::2]:
+            post.tags.add(cls.django)
+
+    def setUp(self):
+        cache.clear()
+
+    def counts(self):
+        return dict(Tag.objects.values_list("name", "post_count"))
+
+    def test_counts_are_maintained(self):
+        self.assertEqual(self.counts(), {"python": 12, "django": 6})
+        self.posts[0].tags.remove(self.django)
+        self.posts[1].is_published = False
+        self.posts[1].save()
+        self.assertEqual(self.counts(), {"python": 11, "django": 5})
+        self.posts[2].delete()
+        self.python.posts.clear()
+        self.assertEqual(self.counts(), {"python": 0, "django": 4})
+
+        Tag.objects.update(post_count=99)
+        Tag.update_post_counts()
+        self.assertEqual(self.counts(), {"python": 0, "django": 4})
+
+    def test_links_saved_in_the_admin(self):
+        admin = User.objects.create_superuser(username="admin", uid="2", password="x")
+        fresh = Tag.objects.create(name="fresh")
+        self.client.force_login(admin)
+        response = self.client.post(
+            reverse("admin:blog_post_add"),
+            {
+                "title": "Admin post",
+                "slug": "admin-post",
+                "content": "Written in the admin",
+                "author": admin.pk,
+                "is_published": "on",
+                "like_count": 0,
+                "dislike_count": 0,
+                "tag_links-TOTAL_FORMS": "1",
+                "tag_links-INITIAL_FORMS": "0",
+                "tag_links-0-tag": fresh.pk,
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        post = Post.objects.get(slug="admin-post")
+        self.assertEqual(PostTag.objects.get(post=post).post_created_at, post.created_at)
+        self.assertEqual(self.counts()["fresh"], 1)
+        self.assertEqual(search_posts("fresh"), [post])
+
+        PostTag.objects.get(post=post).delete()
+        self.assertEqual(self.counts()["fresh"], 0)
+        self.assertEqual(search_posts("fresh"), [])
+
+    def test_pages_for_one_and_several_tags(self):
+        url = reverse("tag_detail", args=["python"])
+        with self.assertNumQueries(2):
+            first = self.client.get(url)
+        self.assertEqual([link.post for link in first.context["links"]], self.posts[:1:-1])
+        second = self.client.get(url, {"cursor": first.context["links"].next_cursor})
+        self.assertEqual([link.post for link in second.context["links"]], self.posts[1::-1])
+        # A cursor of nulls starts over instead of failing
+        restart = self.client.get(url, {"cursor": "W251bGwsIG51bGxd"})
+        self.assertEqual([link.post for link in restart.context["links"]], self.posts[:1:-1])
+
+        both = self.client.get(reverse("tag_detail", args=["python+django"]))
+        self.assertEqual([link.post for link in both.context["links"]], self.posts[10::-2])
+        self.assertEqual(self.client.get(reverse("tag_detail", args=["python+nope"])).status_code, 404)
+        self.assertContains(self.client.get(reverse("tag_list")), reverse("tag_detail", args=["django"]))
+
+
+class PostListingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="author", uid="1")
+        cls.post = Post.objects.create(title="Public", content="word " * 5000, author=cls.user)
+        cls.draft = Post.objects.create(title="Draft", content="Secret", author=cls.user, is_published=False)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_public_list_skips_drafts_and_content(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("public_post_list"))
+        self.assertContains(response, "Public")
+        self.assertContains(response, "by author")
+        self.assertNotContains(response, "Draft")
+        [query] = ctx.captured_queries
+        self.assertNotIn('"content"', query["sql"])
+
+    def test_summary_follows_content(self):
+        self.assertEqual(self.post.excerpt, "word " * 19 + "word…")
+        self.assertEqual((self.post.word_count, self.post.reading_time), (5000, 25))
+
+        self.post.content = "# Tips & *tricks* :smile:\n\n![shot](/media/a.png?x=1&y=2) Short **now**"
+        self.post.save(update_fields=["content"])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.excerpt, "Tips & tricks Short now")
+        self.assertEqual((self.post.word_count, self.post.reading_time), (5, 1))
+        self.assertEqual(self.post.thumbnail, "/media/a.png?x=1&y=2")
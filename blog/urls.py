@@ -2,6 +2,9 @@ from django.urls import path
 from . import views
 
 urlpatterns = [
+    path("search/", views.post_search, name="post_search"),
+    path("tags/", views.tag_list, name="tag_list"),
+    path("tags/<str:slugs>/", views.tag_detail, name="tag_detail"),
     path("posts/", views.post_list, name="post_list"),
     path("posts/public/", views.public_post_list, name="public_post_list"),
     path("posts/create/", views.create_post, name="create_post"),
@@ -9,4 +12,5 @@ urlpatterns = [
     path("posts/<slug:slug>/edit/", views.edit_post, name="edit_post"),
     path("posts/<slug:slug>/delete/", views.delete_post, name="delete_post"),
     path("posts/<int:post_id>/react/", views.post_react, name="post_react"),
+    path("posts/<int:post_id>/comments/", views.post_comments, name="post_comments"),
 ]
\ No newline at end of file
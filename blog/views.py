@@ -1,11 +1,47 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from .forms import PostForm
-from .models import Post, Comment
+from .models import Post, PostTag, Comment, Tag
+from .search import search_posts
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
-from core.utils import paginate
+from django.http import Http404, JsonResponse
+from django.utils import timezone
+from django.utils.dateformat import format as format_date
+from core.cache import cache_anonymous_page
+from core.utils import keyset_page, keyset_paginate, paginate
 import json
+import math
+
+COMMENTS_PAGE_SIZE = 20
+
+
+def comment_page(post, cursor=None, limit=COMMENTS_PAGE_SIZE):
+    """
+    Return a keyset page of top-level comments, newest first. Each comment
+    gets a ``reply_count``.
+    """
+    roots = post.comments.filter(parent__isnull=True).select_related("author")
+    page = keyset_page(roots, cursor, limit)
+    counts = Comment.reply_counts(post, page)
+    for comment in page:
+        comment.reply_count = counts.get(comment.pk, 0)
+    return page
+
+
+def serialize_comment(comment):
+    """
+    Serialize a comment, and any replies linked under ``children``, to JSON.
+    """
+    data = {
+        "id": comment.pk,
+        "author": comment.author.username,
+        "created_at": format_date(timezone.localtime(comment.created_at), "F j, Y, g:i a"),
+        "content": comment.content,
+        "reply_count": getattr(comment, "reply_count", 0),
+    }
+    if hasattr(comment, "children"):
+        data["children"] = [serialize_comment(child) for child in comment.children]
+    return data
 
 
 @login_required
@@ -27,18 +63,14 @@ def create_post(request):
     return render(request, "blog/create_post.html", {"form": form})
 
 
+@cache_anonymous_page("post:{slug}")
 def post_detail(request, slug):
     """
     Render the post detail page.
     """
-    post = get_object_or_404(Post, slug=slug)
-    post_like_count = post.reactions.filter(reaction_type="like").count()
-    post_dislike_count = post.reactions.filter(reaction_type="dislike").count()
-    user_liked = post.reactions.filter(user=request.user, reaction_type="like").exists()
-    user_disliked = post.reactions.filter(
-        user=request.user, reaction_type="dislike"
-    ).exists()
-    comments = post.comments.filter(parent__isnull=True).select_related("author")
+    post = get_object_or_404(
+        Post.objects.select_related("author").prefetch_related("tags"), slug=slug
+    )
 
     if request.method == "POST" and request.user.is_authenticated:
         content = request.POST.get("content")
@@ -55,20 +87,56 @@ def post_detail(request, slug):
         messages.success(request, "Comment added successfully.")
         return redirect("post_detail", slug=slug)
 
+    # Counts are denormalized on the post; only the user's own reaction is queried
+    user_reaction = None
+    if request.user.is_authenticated:
+        user_reaction = (
+            post.reactions.filter(user=request.user)
+            .values_list("reaction_type", flat=True)
+            .first()
+        )
+    comments = comment_page(post)
+
     return render(
         request,
         "blog/post_detail.html",
         {
             "post": post,
-            "post_like_count": post_like_count,
-            "post_dislike_count": post_dislike_count,
-            "user_liked": user_liked,
-            "user_disliked": user_disliked,
+            "post_like_count": post.like_count,
+            "post_dislike_count": post.dislike_count,
+            "user_liked": user_reaction == "like",
+            "user_disliked": user_reaction == "dislike",
             "comments": comments,
         },
     )
 
 
+def post_comments(request, post_id):
+    """
+    Return a page of top-level comments as JSON, or with ``?parent=<id>``
+    the whole reply tree under that comment.
+    """
+    post = get_object_or_404(Post, id=post_id)
+
+    parent_id = request.GET.get("parent")
+    if parent_id:
+        if not parent_id.isdigit():
+            return JsonResponse({"error": "Invalid parent"}, status=400)
+        parent = get_object_or_404(Comment, id=parent_id, post=post)
+        replies = Comment.build_tree(
+            parent.descendants().select_related("author").order_by("-created_at")
+        )
+        return JsonResponse({"comments": [serialize_comment(reply) for reply in replies]})
+
+    page = comment_page(post, request.GET.get("cursor"))
+    return JsonResponse(
+        {
+            "comments": [serialize_comment(comment) for comment in page],
+            "next_cursor": page.next_cursor,
+        }
+    )
+
+
 @login_required
 def edit_post(request, slug):
     """
@@ -105,20 +173,89 @@ def post_list(request):
     """
     Render the post list page.
     """
-    posts = Post.objects.filter(author=request.user)
+    posts = Post.objects.filter(author=request.user).listing()
     page = paginate(request, posts)
     return render(request, "blog/post_list.html", {"posts": page})
 
 
+@cache_anonymous_page("posts")
 def public_post_list(request):
     """
     Render the public post list page.
     """
-    posts = Post.objects.all().order_by("-created_at")
-    page = paginate(request, posts)
+    posts = Post.objects.published().listing()
+    page = keyset_paginate(request, posts)
     return render(request, "blog/public_post_list.html", {"posts": page})
 
 
+TAG_PAGE_SIZE = 10
+TAG_CLOUD_SIZES = 5
+
+
+@cache_anonymous_page("posts")
+def tag_list(request):
+    """
+    Render the tag cloud, each tag sized by its number of posts.
+    """
+    tags = list(Tag.objects.filter(post_count__gt=0))
+    most = max((tag.post_count for tag in tags), default=1)
+    for tag in tags:
+        # Log scale, so one huge tag doesn't flatten all the others
+        tag.size = 1 + round((TAG_CLOUD_SIZES - 1) * math.log(tag.post_count) / math.log(most)) if most > 1 else 1
+    return render(request, "blog/tag_list.html", {"tags": tags})
+
+
+@cache_anonymous_page("posts")
+def tag_detail(request, slugs):
+    """
+    List published posts carrying every tag in ``slugs`` ("python+django"),
+    newest first.
+    """
+    slugs = list(dict.fromkeys(slugs.split("+")))
+    tags = list(Tag.objects.filter(slug__in=slugs))
+    if len(tags) != len(slugs):
+        raise Http404("Tag not found")
+    # Drive the scan from the rarest tag, the others are only probed
+    tags.sort(key=lambda tag: tag.post_count)
+
+    links = keyset_page(
+        PostTag.tagged_with(tags),
+        request.GET.get("cursor"),
+        TAG_PAGE_SIZE,
+        fields=("post_created_at", "post_id"),
+    )
+    return render(request, "blog/tag_detail.html", {"tags": tags, "links": links})
+
+
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE = 50
+
+
+# Not page-cached: every distinct query would take its own cache entry
+def post_search(request):
+    """
+    Search published posts by title, content and tag names.
+    """
+    query = request.GET.get("q", "").strip()
+    try:
+        page = max(int(request.GET.get("page", 1)), 1)
+    except ValueError:
+        page = 1
+    if page > SEARCH_MAX_PAGE:
+        raise Http404("Page out of range")
+
+    results = []
+    if query:
+        results = search_posts(query, limit=SEARCH_PAGE_SIZE + 1, offset=(page - 1) * SEARCH_PAGE_SIZE)
+    context = {
+        "query": query,
+        "results": results[:SEARCH_PAGE_SIZE],
+        "page": page,
+        "has_next": len(results) > SEARCH_PAGE_SIZE,
+    }
+    return render(request, "blog/search.html", context)
+
+
 @login_required
 def post_react(request, post_id):
     post = get_object_or_404(Post, id=post_id)
@@ -127,12 +264,8 @@ def post_react(request, post_id):
     if reaction_type not in ["like", "dislike"]:
         return JsonResponse({"error": "Invalid reaction"}, status=400)
 
-    post.reactions.filter(user=request.user).delete()
-
-    post.reactions.create(user=request.user, reaction_type=reaction_type)
+    reaction = post.react(request.user, reaction_type)
 
-    # Count reactions
-    likes = post.reactions.filter(reaction_type="like").count()
-    dislikes = post.reactions.filter(reaction_type="dislike").count()
-
-    return JsonResponse({"likes": likes, "dislikes": dislikes})
+    return JsonResponse(
+        {"likes": post.like_count, "dislikes": post.dislike_count, "reaction": reaction}
+    )
@@ -0,0 +1,192 @@
+import hashlib
+import uuid
+from functools import wraps
+
+from django.contrib import messages
+from django.core.cache import cache, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.http import HttpResponse
+
+PAGE_CACHE_TIMEOUT = 60 * 60  # backstop only, pages are invalidated by tag
+
+_MISSING = object()
+
+
+class TieredCache(BaseCache):
+    """
+    A small per-process LocMem cache (L1) in front of a shared cache (L2).
+
+    ``LOCATION`` names the shared cache alias. Reads are served from L1 for
+    at most ``OPTIONS["L1_TIMEOUT"]`` seconds, so a value changed by another
+    process can be that stale here; writes and deletes go to both tiers.
+    Keys whose staleness matters should use the ``shared`` cache directly.
+    """
+
+    def __init__(self, location, params):
+        options = params.get("OPTIONS", {})
+        self.l1_timeout = options.get("L1_TIMEOUT", 5)
+        super().__init__({**params, "OPTIONS": {}})
+        self._shared_alias = location
+        self.l1 = LocMemCache(
+            f"tiered-l1-{location}",
+            {"TIMEOUT": self.l1_timeout, "OPTIONS": {"MAX_ENTRIES": options.get("L1_MAX_ENTRIES", 1000)}},
+        )
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def _l1_timeout(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        return self.l1_timeout if timeout is None else min(timeout, self.l1_timeout)
+
+    def _shared_timeout(self, timeout):
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    def get(self, key, default=None, version=None):
+        value = self.l1.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            value = self.shared.get(key, _MISSING, version=version)
+            if value is _MISSING:
+                return default
+            self.l1.set(key, value, self.l1_timeout, version=version)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = self.l1.get_many(keys, version=version)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            fetched = self.shared.get_many(missing, version=version)
+            self.l1.set_many(fetched, self.l1_timeout, version=version)
+            found.update(fetched)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, self._shared_timeout(timeout), version=version)
+        self.l1.set(key, value, self._l1_timeout(timeout), version=version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, self._shared_timeout(timeout), version=version)
+        if added:
+            self.l1.set(key, value, self._l1_timeout(timeout), version=version)
+        return added
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, self._shared_timeout(timeout), version=version)
+        self.l1.set_many(data, self._l1_timeout(timeout), version=version)
+        return failed
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l1.delete(key, version=version)
+        return self.shared.touch(key, self._shared_timeout(timeout), version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self.l1.delete(key, version=version)
+        return self.shared.incr(key, delta, version=version)
+
+    def delete(self, key, version=None):
+        self.l1.delete(key, version=version)
+        return self.shared.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        self.l1.delete_many(keys, version=version)
+        self.shared.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        return self.l1.has_key(key, version=version) or self.shared.has_key(key, version=version)
+
+    def clear(self):
+        self.l1.clear()
+        self.shared.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
+
+
+def shared_cache():
+    """The cache every process sees immediately, bypassing any L1 tier."""
+    return getattr(cache, "shared", cache)
+
+
+def _tag_key(tag):
+    return f"pagecache:tag:{tag}"
+
+
+def get_tag_versions(tags):
+    """
+    Return the current version of each tag, creating missing ones.
+
+    A missing version gets a fresh random value rather than a counter reset,
+    so a page cached before the version was evicted can never match again.
+    """
+    # Versions are read from the shared tier, an invalidation in one
+    # process must be seen by all the others at once
+    tag_cache = shared_cache()
+    keys = {_tag_key(tag): tag for tag in tags}
+    versions = tag_cache.get_many(keys)
+    for key in keys.keys() - versions.keys():
+        tag_cache.add(key, uuid.uuid4().hex, timeout=None)
+        versions[key] = tag_cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def invalidate_cache_tags(*tags):
+    """
+    Invalidate every cached page tagged with any of ``tags``.
+
+    Runs after the current transaction commits, so a concurrent request
+    cannot re-cache the page from data that is about to change.
+    """
+    def bump():
+        shared_cache().set_many({_tag_key(tag): uuid.uuid4().hex for tag in tags}, timeout=None)
+
+    transaction.on_commit(bump)
+
+
+def cache_anonymous_page(*tags):
+    """
+    Cache a view's full response for anonymous GET requests.
+
+    Pages are keyed by the full URL, query string included, and by the
+    current version of each tag. Tags may contain format fields filled from
+    the view's keyword arguments, e.g. ``"post:{slug}"``.
+
+    Responses that set cookies or used the CSRF token are never cached, the
+    token is per visitor and would be replayed to everyone else.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (
+                request.method not in ("GET", "HEAD")
+                or request.user.is_authenticated
+                or len(messages.get_messages(request))
+            ):
+                return view(request, *args, **kwargs)
+
+            page_tags = [tag.format(**kwargs) for tag in tags]
+            url = hashlib.sha256(request.get_full_path().encode()).hexdigest()
+            versions = hashlib.sha256(":".join(get_tag_versions(page_tags)).encode()).hexdigest()
+            key = f"pagecache:page:{url}:{versions}"
+
+            cached = cache.get(key)
+            if cached is not None:
+                content, headers = cached
+                return HttpResponse(content, headers=headers)
+
+            response = view(request, *args, **kwargs)
+            if (
+                response.status_code == 200
+                and not response.streaming
+                and not response.cookies
+                and not request.META.get("CSRF_COOKIE_NEEDS_UPDATE")
+            ):
+                cache.set(key, (response.content, dict(response.items())), timeout=PAGE_CACHE_TIMEOUT)
+            return response
+
+        return wrapper
+
+    return decorator
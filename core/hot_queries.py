@@ -0,0 +1,35 @@
+"""
+Registry of the queries behind the busiest pages, checked by
+``manage.py explain_hot_queries``.
+
+Apps register them in a ``hot_queries`` module::
+
+    @register("published posts")
+    def published_posts():
+        return Post.objects.filter(is_published=True)[:5]
+
+Each function returns the queryset the way its view builds it, with
+placeholder ids and cursors.
+"""
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+# Stand-in cursor row for keyset pages, only the query shape matters
+SAMPLE_CURSOR = (timezone.now(), 1)
+
+_registry = {}
+
+
+def register(name):
+    """Register the decorated function as the hot query ``name``."""
+    def decorator(func):
+        _registry[name] = func
+        return func
+
+    return decorator
+
+
+def hot_queries():
+    """Return ``{name: queryset}`` for every registered hot query."""
+    autodiscover_modules("hot_queries")
+    return {name: func() for name, func in _registry.items()}
@@ -0,0 +1,79 @@
+import time
+
+import bleach
+import markdown
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.models import Post
+from core.utils import MARKDOWN_EXTENSIONS, convert_markdown, markdown_extension_configs
+
+SAMPLE_POST = """# Release notes
+
+!!! note
+    This build ships with a new renderer.
+
+- [x] Faster startup
+- [ ] Sound effects
+
+Check https://github.com/4d1ty/slog and @4d1ty for details ~~soon~~.
+
+```python
+def hello():
+    return "world"
+```
+
+=== "Tab 1"
+    First tab
+
+=== "Tab 2"
+    Second tab
+"""
+
+
+def convert_markdown_unpooled(value, linkify=True):
+    """The previous conversion path: a new Markdown instance per call."""
+    return markdown.markdown(
+        text=bleach.clean(value).replace("&gt;", ">"),
+        extensions=MARKDOWN_EXTENSIONS,
+        extension_configs=markdown_extension_configs(linkify),
+    )
+
+
+class Command(BaseCommand):
+    help = "Benchmark pooled Markdown converters against building one per render."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=100, help="Number of posts to use as corpus")
+        parser.add_argument("--repeat", type=int, default=5, help="Passes over the corpus per method")
+        parser.add_argument("--no-linkify", action="store_true", help="Benchmark with linkify disabled")
+
+    def handle(self, *args, **options):
+        if options["repeat"] < 1:
+            raise CommandError("--repeat must be at least 1.")
+        linkify = not options["no_linkify"]
+
+        corpus = list(Post.objects.values_list("content", flat=True)[: options["limit"]])
+        if not corpus:
+            self.stdout.write("No posts found, using the built-in sample post.")
+            corpus = [SAMPLE_POST]
+
+        for body in corpus:
+            if convert_markdown(body, linkify) != convert_markdown_unpooled(body, linkify):
+                raise CommandError("Pooled and unpooled converters disagree on a post body.")
+
+        results = {}
+        for name, func in (("unpooled", convert_markdown_unpooled), ("pooled", convert_markdown)):
+            start = time.perf_counter()
+            for _ in range(options["repeat"]):
+                for body in corpus:
+                    func(body, linkify)
+            elapsed = time.perf_counter() - start
+            results[name] = elapsed / (options["repeat"] * len(corpus))
+            self.stdout.write(f"{name:>9}: {results[name] * 1000:.3f} ms per render")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{len(corpus)} posts x {options['repeat']} passes, "
+                f"pooled is {results['unpooled'] / results['pooled']:.1f}x faster"
+            )
+        )
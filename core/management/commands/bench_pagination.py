@@ -0,0 +1,85 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from blog.models import Post
+from core.utils import encode_cursor, keyset_paginate, paginate
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Compare offset and keyset pagination latency on the public post listing."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--page", type=int, default=10_000, help="Deep page number to measure")
+        parser.add_argument("--limit", type=int, default=5, help="Posts per page")
+        parser.add_argument("--repeat", type=int, default=20, help="Runs per measurement")
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Create this many throwaway posts first; they are rolled back afterwards",
+        )
+
+    def handle(self, *args, **options):
+        if min(options["page"], options["limit"], options["repeat"]) < 1:
+            raise CommandError("--page, --limit and --repeat must be at least 1.")
+        try:
+            with transaction.atomic():
+                if options["seed"]:
+                    self.seed(options["seed"])
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, count):
+        author = get_user_model().objects.create(username=f"bench-pagination-{time.time_ns()}")
+        Post.objects.bulk_create(
+            (
+                Post(title=f"Bench {i}", slug=f"bench-{author.pk}-{i}", content="Bench", author=author)
+                for i in range(count)
+            ),
+            batch_size=1000,
+        )
+
+    def measure(self, repeat, func):
+        with CaptureQueriesContext(connection) as ctx:
+            func()
+        queries = len(ctx.captured_queries)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return (time.perf_counter() - start) / repeat * 1000, queries
+
+    def run(self, options):
+        posts = Post.objects.all()
+        limit, deep = options["limit"], options["page"]
+        total = posts.count()
+        if total < deep * limit:
+            raise CommandError(
+                f"Page {deep} needs {deep * limit} posts but there are {total}; use --seed."
+            )
+
+        # Cursor pointing at the last post of the page before the deep page
+        before = posts.order_by("-created_at", "-id")[(deep - 1) * limit - 1]
+        cursor = encode_cursor(before, ("created_at", "id"))
+        factory = RequestFactory()
+        cases = [
+            ("offset", 1, factory.get("/", {"page": 1}), paginate),
+            ("offset", deep, factory.get("/", {"page": deep}), paginate),
+            ("keyset", 1, factory.get("/"), keyset_paginate),
+            ("keyset", deep, factory.get("/", {"cursor": cursor}), keyset_paginate),
+        ]
+        for name, page, request, func in cases:
+            ms, queries = self.measure(
+                options["repeat"], lambda: list(func(request, posts, limit))
+            )
+            self.stdout.write(f"{name:>6} page {page:>6}: {ms:8.3f} ms, {queries} queries")
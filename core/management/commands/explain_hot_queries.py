@@ -0,0 +1,47 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.hot_queries import hot_queries
+
+# Plan lines meaning a query reads a whole table or sorts its result.
+# Walking an index in order ("SCAN t USING INDEX i", "Index Scan") is fine,
+# the LIMIT stops it after one page.
+PLAN_PROBLEMS = {
+    "sqlite": re.compile(r"\bSCAN \S+$|USE TEMP B-TREE"),
+    "postgresql": re.compile(r"Seq Scan|\bSort\b"),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN every registered hot query and fail if any plan does a full "
+        "table scan or a temporary sort. PostgreSQL prefers sequential scans "
+        "on small tables, so run it there against realistic data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--verbose-plans", action="store_true", help="Print the plan of every query")
+
+    def handle(self, *args, **options):
+        problems = PLAN_PROBLEMS.get(connection.vendor)
+        if problems is None:
+            raise CommandError(f"Query plans can't be checked on {connection.vendor}.")
+
+        failed = []
+        for name, queryset in hot_queries().items():
+            plan = queryset.explain()
+            bad = [line.strip() for line in plan.splitlines() if problems.search(line)]
+            if bad:
+                failed.append(name)
+                self.stdout.write(self.style.ERROR(f"FAIL {name}"))
+                for line in bad:
+                    self.stdout.write(f"    {line}")
+            else:
+                self.stdout.write(self.style.SUCCESS(f"ok   {name}"))
+            if options["verbose_plans"]:
+                self.stdout.write("\n".join(f"    | {line}" for line in plan.splitlines()))
+
+        if failed:
+            raise CommandError(f"{len(failed)} hot quer{'y' if len(failed) == 1 else 'ies'} not fully indexed: {', '.join(failed)}")
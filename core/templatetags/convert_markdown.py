@@ -1,42 +1,9 @@
-import markdown
-import bleach
 from django import template
 from django.template.defaultfilters import stringfilter
 
-register = template.Library()
-
-# List of Markdown extensions to use
-extensions = [
-    "markdown.extensions.admonition",
-    "pymdownx.extra",
-    "pymdownx.tasklist",
-    "pymdownx.magiclink",
-    "pymdownx.emoji",
-    "pymdownx.details",
-    "pymdownx.superfences",
-    "markdown.extensions.toc",
-    "pymdownx.tabbed",
-    "pymdownx.tilde",
-    "pymdownx.snippets",
-]
-
-# Configuration options for specific extensions
-extension_configs = {
-    "pymdownx.tasklist": {
-        "custom_checkbox": True,
-    },
-}
+from core.utils import render_markdown
 
-linkify_options = {
-    "pymdownx.magiclink": {
-        "hide_protocol": True,
-        "social_url_shorthand": True,
-        "social_url_shortener": True,
-        "repo_url_shortener": True,
-        "normalize_issue_symbols": True,
-        "repo_url_shorthand": True,
-    },
-}
+register = template.Library()
 
 
 @register.filter(name="convert_markdown", is_safe=False)
@@ -45,18 +12,14 @@ def convert_markdown(value, linkify=True):
     """
     Filter to convert Markdown text to HTML using specified extensions and configs.
 
+    The rendered HTML is cached by a hash of the content, the extension
+    configuration and the ``linkify`` flag, so repeated renders are a lookup.
+
     Args:
         value (str): The Markdown text to convert.
-        user: User-related data (not used in this function).
+        linkify (bool): Whether to shorten and link URLs, mentions and issues.
 
     Returns:
         str: The converted HTML.
     """
-    extension_conf = {**extension_configs}
-    if linkify:
-        extension_conf = {**extension_configs, **linkify_options}
-    return markdown.markdown(
-        text=bleach.clean(value).replace("&gt;", ">"),
-        extensions=extensions,
-        extension_configs=extension_conf,
-    )
\ No newline at end of file
+    return render_markdown(value, linkify=linkify)
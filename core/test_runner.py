@@ -0,0 +1,32 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+# Same tiers as in production, but both in memory and private to the run
+TEST_CACHES = {
+    "default": {
+        "BACKEND": "core.cache.TieredCache",
+        "LOCATION": "shared",
+        "OPTIONS": {"L1_TIMEOUT": 5},
+    },
+    "shared": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "slog-tests",
+    },
+}
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Run the suite against in-memory caches, so tests that clear the cache
+    never wipe the one a server on the same checkout is using, and nothing
+    cached carries over from one run to the next.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_settings = override_settings(CACHES=TEST_CACHES)
+        self.cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_settings.disable()
+        super().teardown_test_environment(**kwargs)
@@ -1,3 +1,147 @@
-from django.test import TestCase
+import base64
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.utils import timezone
+
+from blog.models import Post
+from core.cache import TieredCache, cache_anonymous_page
+from core.management.commands.bench_markdown import convert_markdown_unpooled
+from core.utils import convert_markdown, keyset_page, markdown_cache_key, render_markdown
+
+
+class ConvertMarkdownTests(TestCase):
+    def test_pooled_converter_matches_fresh_instance(self):
+        docs = [
+            "# Title\n\n# Title\n\nText[^1]\n\n[^1]: A footnote",
+            "*[HTML]: Hyper Text Markup Language\n\nHTML abbreviations",
+            "- [x] done\n- [ ] todo\n\nhttps://github.com/4d1ty/slog",
+        ]
+        # Run twice so the second pass exercises converters that were reset
+        for doc in docs * 2:
+            for linkify in (True, False):
+                self.assertEqual(
+                    convert_markdown(doc, linkify), convert_markdown_unpooled(doc, linkify)
+                )
+
+
+class RenderMarkdownTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_cache_key_changes_with_content_and_config(self):
+        key = markdown_cache_key("# Hi")
+        self.assertEqual(markdown_cache_key("# Hi"), key)
+        self.assertNotEqual(markdown_cache_key("# Hi!"), key)
+        self.assertNotEqual(markdown_cache_key("# Hi", linkify=False), key)
+        with mock.patch("core.utils.MARKDOWN_CONFIG_HASH", "other"):
+            self.assertNotEqual(markdown_cache_key("# Hi"), key)
+
+    def test_serves_stored_html(self):
+        html = render_markdown("# Hi")
+        self.assertEqual(cache.get(markdown_cache_key("# Hi")), html)
+        # Whatever is stored is returned, without converting again
+        cache.set(markdown_cache_key("# Hi"), "<p>cached</p>")
+        with mock.patch("core.utils.convert_markdown") as convert:
+            self.assertEqual(render_markdown("# Hi"), "<p>cached</p>")
+        convert.assert_not_called()
+
+    def test_post_save_warms_cache(self):
+        author = get_user_model().objects.create_user(username="author", uid="1")
+        Post.objects.create(title="Warm", content="**warm**", author=author)
+        self.assertEqual(cache.get(markdown_cache_key("**warm**")), convert_markdown("**warm**"))
+
+
+class KeysetPageTests(TestCase):
+    def test_walks_every_row_once(self):
+        author = get_user_model().objects.create_user(username="author", uid="1")
+        Post.objects.bulk_create(
+            [Post(title=f"Post {i}", slug=f"post-{i}", content="", author=author) for i in range(12)]
+        )
+        # Ties on created_at are broken by id
+        Post.objects.filter(pk__lte=6).update(created_at=timezone.now())
+
+        seen, cursor = [], None
+        while True:
+            with self.assertNumQueries(1):
+                page = keyset_page(Post.objects.all(), cursor, limit=5)
+            seen.extend(post.pk for post in page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(sorted(seen), sorted(Post.objects.values_list("pk", flat=True)))
+        self.assertEqual(len(seen), 12)
+
+    def test_invalid_cursor_returns_first_page(self):
+        page = keyset_page(Post.objects.all(), "not-a-cursor")
+        self.assertFalse(page.has_previous())
+
+    def test_null_cursor_returns_first_page(self):
+        cursor = base64.urlsafe_b64encode(b"[null, null]").decode()
+        page = keyset_page(Post.objects.all(), cursor)
+        self.assertFalse(page.has_previous())
+
+
+class ExplainHotQueriesTests(TestCase):
+    def test_hot_queries_use_indexes(self):
+        # Raises CommandError if any plan scans a table or sorts
+        call_command("explain_hot_queries", stdout=StringIO())
+
+
+class CacheAnonymousPageTests(TestCase):
+    def get(self, view, path):
+        request = RequestFactory().get(path)
+        request.user = AnonymousUser()
+        return view(request)
+
+    def test_replays_headers_and_skips_csrf_pages(self):
+        calls = []
+
+        @cache_anonymous_page("test")
+        def page(request):
+            calls.append(request)
+            response = HttpResponse("page", content_type="text/plain; charset=utf-8")
+            response["X-Robots-Tag"] = "noindex"
+            return response
+
+        @cache_anonymous_page("test")
+        def form(request):
+            calls.append(request)
+            return HttpResponse(get_token(request))
+
+        self.get(page, "/page/")
+        response = self.get(page, "/page/")
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(response["X-Robots-Tag"], "noindex")
+        self.assertEqual(response["Content-Type"], "text/plain; charset=utf-8")
+
+        first, second = self.get(form, "/form/"), self.get(form, "/form/")
+        self.assertEqual(len(calls), 3)
+        self.assertNotEqual(first.content, second.content)
+
+
+class TieredCacheTests(SimpleTestCase):
+    def test_l1_serves_reads_and_writes_go_through(self):
+        tiered = TieredCache("tiered-test-shared", {"OPTIONS": {"L1_TIMEOUT": 60}})
+        shared = LocMemCache("tiered-test-shared", {})
+        with mock.patch.object(TieredCache, "shared", shared):
+            tiered.set("key", "one")
+            self.assertEqual(shared.get("key"), "one")
+
+            # Another process changing the shared value is seen once L1 expires
+            shared.set("key", "two")
+            self.assertEqual(tiered.get("key"), "one")
+            tiered.l1.clear()
+            self.assertEqual(tiered.get("key"), "two")
+
+            tiered.delete("key")
+            self.assertIsNone(tiered.get("key"))
+            self.assertEqual(tiered.get_many(["key"]), {})
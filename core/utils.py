@@ -1,7 +1,238 @@
+import base64
+import binascii
+import hashlib
+import json
+import threading
+from collections.abc import Sequence
+
+import bleach
+import markdown
+import pymdownx
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
 from django.core.paginator import Paginator
+from django.db.models import Q
+
+# List of Markdown extensions to use
+MARKDOWN_EXTENSIONS = [
+    "markdown.extensions.admonition",
+    "pymdownx.extra",
+    "pymdownx.tasklist",
+    "pymdownx.magiclink",
+    "pymdownx.emoji",
+    "pymdownx.details",
+    "pymdownx.superfences",
+    "markdown.extensions.toc",
+    "pymdownx.tabbed",
+    "pymdownx.tilde",
+    "pymdownx.snippets",
+]
+
+# Configuration options for specific extensions
+MARKDOWN_EXTENSION_CONFIGS = {
+    "pymdownx.tasklist": {
+        "custom_checkbox": True,
+    },
+}
+
+# Extra configuration applied when links should be generated
+MARKDOWN_LINKIFY_CONFIGS = {
+    "pymdownx.magiclink": {
+        "hide_protocol": True,
+        "social_url_shorthand": True,
+        "social_url_shortener": True,
+        "repo_url_shortener": True,
+        "normalize_issue_symbols": True,
+        "repo_url_shorthand": True,
+    },
+}
+
+MARKDOWN_CACHE_TIMEOUT = 60 * 60 * 24 * 7  # cache rendered HTML for a week
+
+# Fingerprint of everything that affects the rendered output. It is part of
+# every cache key, so changing the extension list or upgrading a library
+# invalidates all previously cached HTML.
+MARKDOWN_CONFIG_HASH = hashlib.sha256(
+    json.dumps(
+        [
+            markdown.__version__,
+            pymdownx.__version__,
+            bleach.__version__,
+            MARKDOWN_EXTENSIONS,
+            MARKDOWN_EXTENSION_CONFIGS,
+            MARKDOWN_LINKIFY_CONFIGS,
+        ],
+        sort_keys=True,
+    ).encode()
+).hexdigest()[:16]
 
 
 def paginate(request, qs, limit=5):
     paginated_qs = Paginator(qs, limit, orphans=5)
     page_no = request.GET.get("page")
     return paginated_qs.get_page(page_no)
+
+
+class KeysetPage(Sequence):
+    """
+    A page of keyset-paginated objects. Like a ``Paginator`` page it can be
+    iterated and indexed, but it only knows the cursor of the next page.
+    """
+
+    def __init__(self, object_list, cursor=None, next_cursor=None):
+        self.object_list = object_list
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+
+    def __repr__(self):
+        return f"<KeysetPage after {self.cursor or 'start'}>"
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.cursor is not None
+
+
+def encode_cursor(obj, fields):
+    """
+    Encode the values of ``fields`` on ``obj`` as an opaque URL-safe cursor.
+    """
+    values = [getattr(obj, field) for field in fields]
+    values = [value.isoformat() if hasattr(value, "isoformat") else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def decode_cursor(model, cursor, fields):
+    """
+    Decode a cursor made by ``encode_cursor``. Raises ``ValueError`` if it
+    is malformed.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(fields):
+            raise ValueError("Cursor does not match the ordering fields")
+        values = [
+            model._meta.get_field(field).to_python(value)
+            for field, value in zip(fields, values)
+        ]
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValidationError) as exc:
+        raise ValueError("Malformed cursor") from exc
+    # Rows cannot be compared against NULL, so such a cursor never matches
+    if None in values:
+        raise ValueError("Cursor has empty values")
+    return values
+
+
+def keyset_queryset(qs, values=None, fields=("created_at", "id")):
+    """
+    Order ``qs`` descending by ``fields`` and, given the ``values`` of a
+    cursor row, keep only the rows sorting after it.
+    """
+    qs = qs.order_by(*[f"-{field}" for field in fields])
+    if values is not None:
+        # Rows sorting after the cursor: (a < x) or (a = x and b < y) ...
+        # The redundant bound on the first field lets the database seek into
+        # the index instead of walking it from the top
+        after = Q()
+        for i, field in enumerate(fields):
+            equal = {name: value for name, value in zip(fields[:i], values[:i])}
+            after |= Q(**equal, **{f"{field}__lt": values[i]})
+        qs = qs.filter(after, **{f"{fields[0]}__lte": values[0]})
+    return qs
+
+
+def keyset_page(qs, cursor=None, limit=5, fields=("created_at", "id")):
+    """
+    Return the page of ``qs`` after ``cursor``, ordered descending by
+    ``fields``. Instead of ``COUNT(*)`` and ``OFFSET`` it filters on the last
+    row of the previous page, so every page costs the same indexed query.
+    An invalid cursor yields the first page.
+    """
+    values = None
+    if cursor:
+        try:
+            values = decode_cursor(qs.model, cursor, fields)
+        except ValueError:
+            cursor = None
+
+    rows = list(keyset_queryset(qs, values, fields)[: limit + 1])
+    next_cursor = encode_cursor(rows[limit - 1], fields) if len(rows) > limit else None
+    return KeysetPage(rows[:limit], cursor, next_cursor)
+
+
+def keyset_paginate(request, qs, limit=5):
+    """
+    Keyset alternative to ``paginate``, reading the cursor from ``?cursor=``.
+    """
+    return keyset_page(qs, request.GET.get("cursor"), limit)
+
+
+def markdown_cache_key(value, linkify=True):
+    """
+    Build the cache key for the rendered HTML of ``value``.
+    """
+    digest = hashlib.sha256(value.encode()).hexdigest()
+    return f"markdown:{MARKDOWN_CONFIG_HASH}:{int(bool(linkify))}:{digest}"
+
+
+_markdown_local = threading.local()
+
+
+def markdown_extension_configs(linkify=True):
+    """
+    Return the extension configs for the given ``linkify`` flag.
+    """
+    if linkify:
+        return {**MARKDOWN_EXTENSION_CONFIGS, **MARKDOWN_LINKIFY_CONFIGS}
+    return {**MARKDOWN_EXTENSION_CONFIGS}
+
+
+def get_markdown_converter(linkify=True):
+    """
+    Return this thread's pre-built Markdown converter for ``linkify``.
+
+    Building a ``Markdown`` instance imports and registers every extension,
+    so one converter per configuration is kept per thread and reused.
+    """
+    converters = getattr(_markdown_local, "converters", None)
+    if converters is None:
+        converters = _markdown_local.converters = {}
+    linkify = bool(linkify)
+    md = converters.get(linkify)
+    if md is None:
+        md = converters[linkify] = markdown.Markdown(
+            extensions=MARKDOWN_EXTENSIONS,
+            extension_configs=markdown_extension_configs(linkify),
+        )
+    return md
+
+
+def convert_markdown(value, linkify=True):
+    """
+    Convert Markdown text to sanitized HTML, without caching.
+    """
+    md = get_markdown_converter(linkify)
+    try:
+        return md.convert(bleach.clean(value).replace("&gt;", ">"))
+    finally:
+        md.reset()
+
+
+def render_markdown(value, linkify=True):
+    """
+    Convert Markdown text to HTML, reusing a cached render when the same
+    content was already converted with the current extension configuration.
+    """
+    key = markdown_cache_key(value, linkify)
+    html = cache.get(key)
+    if html is None:
+        html = convert_markdown(value, linkify=linkify)
+        cache.set(key, html, timeout=MARKDOWN_CACHE_TIMEOUT)
+    return html
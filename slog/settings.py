@@ -60,13 +60,21 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Shared by every worker and kept across restarts: a file cache by default,
+# or e.g. CACHE_URL=redis://localhost:6379/1. The default alias adds a short
+# per-process tier in front of it.
 CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
-        "LOCATION": "unique-snowflake",
-    }
+        "BACKEND": "core.cache.TieredCache",
+        "LOCATION": "shared",
+        "OPTIONS": {"L1_TIMEOUT": 5, "L1_MAX_ENTRIES": 1000},
+    },
+    "shared": env.cache_url("CACHE_URL", default=f"filecache://{BASE_DIR / '.cache'}?max_entries=20000"),
 }
 
+# Swaps CACHES for in-memory ones while the test suite runs
+TEST_RUNNER = "core.test_runner.TestRunner"
+
 ROOT_URLCONF = "slog.urls"
 
 TEMPLATES = [
@@ -94,6 +102,13 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": {
+            # Take the write lock up front so concurrent writers queue on the
+            # busy timeout instead of failing with "database is locked".
+            "transaction_mode": "IMMEDIATE",
+            "timeout": 20,
+            "init_command": "PRAGMA journal_mode=WAL;",
+        },
     }
 }
 
@@ -137,6 +152,21 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = "media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Web game ZIP extraction, run in background worker threads
+WEBGAME_EXTRACT_WORKERS = env.int("WEBGAME_EXTRACT_WORKERS", default=2)
+WEBGAME_EXTRACT_CHUNK_BYTES = 1024 * 1024
+WEBGAME_MAX_MEMBERS = env.int("WEBGAME_MAX_MEMBERS", default=5000)
+WEBGAME_MAX_MEMBER_BYTES = env.int("WEBGAME_MAX_MEMBER_BYTES", default=100 * 1024 * 1024)
+WEBGAME_MAX_EXTRACTED_BYTES = env.int("WEBGAME_MAX_EXTRACTED_BYTES", default=250 * 1024 * 1024)
+WEBGAME_COMPRESS_MIN_BYTES = 1024
+WEBGAME_FILE_MAX_AGE = 60 * 60 * 24 * 365
+
+# Chunked game uploads, assembled under MEDIA_ROOT/uploads
+WEBGAME_MAX_UPLOAD_BYTES = env.int("WEBGAME_MAX_UPLOAD_BYTES", default=200 * 1024 * 1024)
+WEBGAME_UPLOAD_QUOTA_BYTES = env.int("WEBGAME_UPLOAD_QUOTA_BYTES", default=500 * 1024 * 1024)
+WEBGAME_UPLOAD_CHUNK_BYTES = 8 * 1024 * 1024
+WEBGAME_UPLOAD_EXPIRY = 60 * 60 * 24
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
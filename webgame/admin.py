@@ -3,12 +3,18 @@ from .models import WebGame
 
 @admin.register(WebGame)
 class WebGameAdmin(admin.ModelAdmin):
-    list_display = ("title", "slug", "created_at", "is_approved")
+    list_display = ("title", "slug", "created_at", "is_approved", "status")
     search_fields = ("title", "slug")
     prepopulated_fields = {"slug": ("title",)}
-    readonly_fields = ("created_at", "author", "extracted_path")
+    readonly_fields = ("created_at", "author", "status", "status_message", "build")
+    list_filter = ("status", "is_approved")
     list_editable = ("is_approved",)
 
     def save_model(self, request, obj, form, change):
         obj.author = request.user
-        super().save_model(request, obj, form, change)
\ No newline at end of file
+        super().save_model(request, obj, form, change)
+
+    def delete_queryset(self, request, queryset):
+        # Per-object deletes release each game's blobs
+        for game in queryset:
+            game.delete()
\ No newline at end of file
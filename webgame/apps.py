@@ -1,6 +1,14 @@
+import mimetypes
+
 from django.apps import AppConfig
 
 
 class WebgameConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'webgame'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        # Browsers only compile WebAssembly streamed with its own type
+        mimetypes.add_type("application/wasm", ".wasm")
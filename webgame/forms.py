@@ -1,7 +1,39 @@
+from django import forms
 from django.forms import ModelForm
-from .models import WebGame
+from .models import GameUpload, WebGame
 
 class WebGameForm(ModelForm):
+    upload_id = forms.UUIDField(required=False, widget=forms.HiddenInput)
+
     class Meta:
         model = WebGame
-        fields = ['title', 'description', 'zip_file', 'url']
\ No newline at end of file
+        fields = ['title', 'description', 'zip_file', 'url']
+
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user = user
+        self.upload = None
+
+    def clean(self):
+        cleaned_data = super().clean()
+        upload_id = cleaned_data.get("upload_id")
+        if upload_id:
+            # A chunked upload replaces the file field, the assembled ZIP is
+            # moved into place when the game is saved
+            self.upload = GameUpload.objects.filter(pk=upload_id, user=self.user).first()
+            if self.upload is None or not self.upload.is_complete:
+                raise forms.ValidationError("The uploaded file is missing or incomplete.")
+            cleaned_data["zip_file"] = self.upload.as_file()
+        return cleaned_data
+
+    def save(self, commit=True):
+        game = super().save(commit=commit)
+        if commit:
+            self.finish_upload()
+        return game
+
+    def finish_upload(self):
+        """Forget the chunked upload once its file belongs to the game."""
+        if self.upload is not None:
+            self.upload.delete()
+            self.upload = None
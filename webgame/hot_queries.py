@@ -0,0 +1,14 @@
+from core.hot_queries import SAMPLE_CURSOR, register
+from core.utils import keyset_queryset
+
+from .models import WebGame
+
+
+@register("index: latest approved games")
+def latest_games():
+    return WebGame.objects.filter(is_approved=True)[:5]
+
+
+@register("game_list: page after cursor")
+def approved_games_page():
+    return keyset_queryset(WebGame.objects.filter(is_approved=True), SAMPLE_CURSOR)[:6]
@@ -0,0 +1,76 @@
+"""
+Helpers for conditional, ranged and content-negotiated file responses.
+"""
+
+
+def negotiate_encoding(header, available):
+    """
+    Pick the preferred encoding from ``available`` that the client's
+    ``Accept-Encoding`` header allows, or ``None`` for the identity.
+    """
+    accepted = {}
+    for item in (header or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.strip().lower()] = quality
+
+    best = None
+    for encoding in available:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > 0 and (best is None or quality > best[1]):
+            best = encoding, quality
+    return best[0] if best else None
+
+
+def etag_matches(header, etag):
+    """Whether an ``If-None-Match`` header matches ``etag`` (weak comparison)."""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def iter_file(path, start, length, chunk_size):
+    """
+    Yield ``length`` bytes of the file at ``path`` starting at ``start``.
+    """
+    with open(path, "rb") as fp:
+        fp.seek(start)
+        while length > 0:
+            chunk = fp.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def parse_range(header, size):
+    """
+    Parse a single-range ``Range`` header into ``(start, end)`` inclusive.
+
+    Returns ``None`` when the header is absent or not a single byte range,
+    and raises ``ValueError`` when the range cannot be satisfied.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start, _, end = header[len("bytes="):].strip().partition("-")
+    try:
+        if not start:
+            # Suffix range: the last N bytes
+            length = int(end)
+            return (max(size - length, 0), size - 1) if length > 0 else None
+        start = int(start)
+        end = int(end) if end else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        raise ValueError("Range not satisfiable")
+    return start, min(end, size - 1)
@@ -0,0 +1,41 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from webgame.models import Blob
+from webgame.storage import blob_root, remove_blob
+
+# Younger files may belong to a game being processed right now, whose rows
+# are not committed yet
+ORPHAN_MIN_AGE = 60 * 60
+
+
+class Command(BaseCommand):
+    help = "Rebuild blob reference counts and delete blobs no game uses anymore."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            Blob.rebuild_ref_counts()
+            freed = Blob.collect_garbage()
+        self.stdout.write(f"Freed {len(freed)} unreferenced blobs.")
+
+        # Files left behind by interrupted uploads have no row at all
+        known = set(Blob.objects.values_list("pk", flat=True))
+        cutoff = time.time() - ORPHAN_MIN_AGE
+        orphans = 0
+        for dirpath, _, filenames in os.walk(blob_root()):
+            for name in filenames:
+                try:
+                    if os.path.getmtime(os.path.join(dirpath, name)) > cutoff:
+                        continue
+                except FileNotFoundError:
+                    continue
+                if name.startswith(".tmp-"):
+                    os.unlink(os.path.join(dirpath, name))
+                    orphans += 1
+                elif name.split(".")[0] not in known:
+                    remove_blob(name.split(".")[0])
+                    orphans += 1
+        self.stdout.write(self.style.SUCCESS(f"Removed {orphans} orphaned files."))
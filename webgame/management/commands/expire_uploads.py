@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from webgame.models import GameUpload
+
+
+class Command(BaseCommand):
+    help = "Delete chunked uploads that were abandoned before they were used."
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(seconds=settings.WEBGAME_UPLOAD_EXPIRY)
+        expired = 0
+        for upload in GameUpload.objects.filter(updated_at__lt=cutoff):
+            upload.delete()
+            expired += 1
+        self.stdout.write(self.style.SUCCESS(f"Deleted {expired} abandoned uploads."))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from webgame.models import WebGame
+from webgame.tasks import process_game
+
+
+class Command(BaseCommand):
+    help = (
+        "Validate game ZIPs that are still pending, e.g. after a restart dropped "
+        "the in-process queue."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--failed", action="store_true", help="Also retry games that failed")
+
+    def handle(self, *args, **options):
+        statuses = [WebGame.STATUS_PENDING, WebGame.STATUS_PROCESSING]
+        if options["failed"]:
+            statuses.append(WebGame.STATUS_FAILED)
+
+        games = WebGame.objects.filter(status__in=statuses).exclude(zip_file="")
+        for game_id, title in games.values_list("pk", "title"):
+            process_game(game_id)
+            game = WebGame.objects.get(pk=game_id)
+            self.stdout.write(f"{title}: {game.get_status_display()} {game.status_message}".rstrip())
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-18 03:33
+
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def set_existing_statuses(apps, schema_editor):
+    # Games were extracted synchronously so far, nothing is left pending
+    WebGame = apps.get_model("webgame", "WebGame")
+    WebGame.objects.filter(~Q(extracted_path="") | Q(zip_file="") | Q(zip_file__isnull=True)).update(status="ready")
+    WebGame.objects.exclude(status="ready").update(
+        status="failed", status_message="The archive has no index.html at its root"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webgame', '0007_remove_webgame_reactions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webgame',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('extracting', 'Extracting'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', help_text="State of the uploaded ZIP's background extraction", max_length=20),
+        ),
+        migrations.AddField(
+            model_name='webgame',
+            name='status_message',
+            field=models.TextField(blank=True, help_text='Why extraction failed, if it did'),
+        ),
+        migrations.RunPython(set_existing_statuses, migrations.RunPython.noop),
+    ]
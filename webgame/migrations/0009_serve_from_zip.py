@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-18 03:35
+
+from django.db import migrations, models
+
+
+def requeue_interrupted(apps, schema_editor):
+    # Half-extracted games get validated again by process_games
+    WebGame = apps.get_model("webgame", "WebGame")
+    WebGame.objects.filter(status="extracting").update(status="pending")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webgame', '0008_webgame_status'),
+    ]
+
+    operations = [
+        migrations.RunPython(requeue_interrupted, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='webgame',
+            name='extracted_path',
+        ),
+        migrations.AlterField(
+            model_name='webgame',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', help_text="State of the uploaded ZIP's background processing", max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='webgame',
+            name='status_message',
+            field=models.TextField(blank=True, help_text='Why processing failed, if it did'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.5 on 2026-10-18 03:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def requeue_hosted_games(apps, schema_editor):
+    # Uploaded games move to the blob store when process_games runs
+    WebGame = apps.get_model("webgame", "WebGame")
+    WebGame.objects.exclude(zip_file="").exclude(zip_file__isnull=True).update(status="pending")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webgame', '0009_serve_from_zip'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('sha256', models.CharField(help_text='SHA-256 of the content', max_length=64, primary_key=True, serialize=False)),
+                ('size', models.BigIntegerField(help_text='Size in bytes')),
+                ('ref_count', models.PositiveIntegerField(default=0, help_text='Number of game files using this blob')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='webgame',
+            name='build',
+            field=models.PositiveIntegerField(default=0, help_text='Number of the current file set, bumped on every processed upload'),
+        ),
+        migrations.CreateModel(
+            name='GameFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(help_text='Path of the file inside the game', max_length=1024)),
+                ('blob', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='game_files', to='webgame.blob')),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='files', to='webgame.webgame')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('game', 'path'), name='unique_game_file_path')],
+            },
+        ),
+        migrations.RunPython(requeue_hosted_games, migrations.RunPython.noop),
+    ]
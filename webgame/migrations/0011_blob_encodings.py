@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 03:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webgame', '0010_blob_store'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blob',
+            name='encodings',
+            field=models.CharField(blank=True, help_text="Pre-compressed variants stored next to the blob, e.g. 'br,gzip'", max_length=32),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-18 03:41
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webgame', '0011_blob_encodings'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GameUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(help_text='Name of the file being uploaded', max_length=255)),
+                ('size', models.BigIntegerField(help_text='Total size announced by the client, in bytes')),
+                ('received', models.BigIntegerField(default=0, help_text='Bytes stored so far')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='game_uploads', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
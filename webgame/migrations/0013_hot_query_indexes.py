@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-18 03:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webgame', '0012_game_upload'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='webgame',
+            index=models.Index(condition=models.Q(('is_approved', True)), fields=['-created_at', '-id'], name='webgame_approved_created_idx'),
+        ),
+    ]
@@ -1,15 +1,25 @@
+import hashlib
 import shutil
-from django.db import models
+import tempfile
+import uuid
+from collections import Counter
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.urls import reverse
+from django.utils import timezone
 from django.utils.text import slugify
 from django.core.exceptions import ValidationError
+from django.core.files import File
 from django.core.validators import FileExtensionValidator
 from django.conf import settings
 import os
-import zipfile
+
+from .storage import blob_path, remove_blob
 
 def validate_file_size(value):
-    """Limit file upload size to 5MB."""
-    limit = 5 * 1024 * 1024  # 5 MB
+    """Limit file upload size to WEBGAME_MAX_UPLOAD_BYTES."""
+    limit = settings.WEBGAME_MAX_UPLOAD_BYTES
     if value.size > limit:
         raise ValidationError(f"Max file size is {limit / (1024*1024)} MB")
 
@@ -18,6 +28,17 @@ def game_upload_path(instance, filename):
     return f"games/{slugify(instance.title)}/{filename}"
 
 class WebGame(models.Model):
+    STATUS_PENDING = "pending"
+    STATUS_PROCESSING = "processing"
+    STATUS_READY = "ready"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_PROCESSING, "Processing"),
+        (STATUS_READY, "Ready"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     slug = models.SlugField(unique=True)
@@ -31,10 +52,6 @@ class WebGame(models.Model):
             FileExtensionValidator(allowed_extensions=["zip"]),
         ],
     )
-    extracted_path = models.FileField(
-        blank=True,
-        help_text="Auto-filled path to extracted index.html"
-    )
     url = models.URLField(
         max_length=200,
         blank=True,
@@ -47,13 +64,28 @@ class WebGame(models.Model):
         related_name="webgames",
     )
     is_approved = models.BooleanField(default=False)
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        help_text="State of the uploaded ZIP's background processing",
+    )
+    status_message = models.TextField(blank=True, help_text="Why processing failed, if it did")
+    build = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of the current file set, bumped on every processed upload",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Partial, so the bare "WHERE is_approved" filter can use it
+            models.Index(fields=["-created_at", "-id"], condition=Q(is_approved=True), name="webgame_approved_created_idx"),
+        ]
 
     def clean(self):
-        if not self.zip_file and not self.url:
+        if not self.zip_file and not self.url and not self.has_files():
             raise ValidationError("You must upload a ZIP file or provide a game URL.")
         if self.zip_file and not self.zip_file.name.endswith(".zip"):
             raise ValidationError("Uploaded file must be a ZIP archive.")
@@ -63,43 +95,327 @@ class WebGame(models.Model):
             raise ValidationError("You cannot provide both a ZIP file and a game URL.")
 
     def save(self, *args, **kwargs):
+        if kwargs.get("update_fields") is not None:
+            # Partial saves (e.g. status updates) never touch the archive
+            return super().save(*args, **kwargs)
+
         if not self.slug:
             self.slug = slugify(self.title)
+
+        zip_changed = bool(self.zip_file) and (
+            self._state.adding
+            or WebGame.objects.filter(pk=self.pk).values_list("zip_file", flat=True).first()
+            != self.zip_file.name
+        )
+        if zip_changed:
+            self.status, self.status_message = self.STATUS_PENDING, ""
+        elif not self.zip_file and self.url:
+            self.status, self.status_message = self.STATUS_READY, ""
         super().save(*args, **kwargs)
 
-        # Handle zip extraction
-        if self.zip_file and self.zip_file.name.endswith(".zip"):
-            zip_path = self.zip_file.path
-            extract_to = os.path.join(settings.MEDIA_ROOT, "games", self.slug)
-            os.makedirs(extract_to, exist_ok=True)
+        if not self.zip_file and self.url and self.has_files():
+            # Switched to an external URL, the hosted files are not needed anymore
+            self.release_files()
+
+        # Validation runs in the background, the upload request returns now
+        if zip_changed:
+            from .tasks import enqueue_processing
+
+            enqueue_processing(self)
 
-            with zipfile.ZipFile(zip_path, "r") as zf:
-                zf.extractall(extract_to)
+    def set_status(self, status, message=""):
+        self.status, self.status_message = status, message
+        self.save(update_fields=["status", "status_message"])
 
-            index_path = os.path.join(extract_to, "index.html")
-            if os.path.exists(index_path):
-                # URL path for iframe
-                self.extracted_path = f"games/{self.slug}/index.html"
-                super().save(update_fields=["extracted_path"])
+    def has_files(self):
+        return self.pk is not None and self.files.exists()
+
+    def replace_files(self, manifest, encodings=None):
+        """
+        Point the game at a new set of files, ``manifest`` mapping each path
+        to a ``(sha256, size)`` pair whose blob is already in the store, and
+        ``encodings`` the pre-compressed variants written for blobs that were
+        (re)written. Blobs the previous set no longer shares with anything
+        are freed after the commit.
+        """
+        by_encodings = {}
+        for sha256, kept in (encodings or {}).items():
+            by_encodings.setdefault(",".join(kept), []).append(sha256)
+        with transaction.atomic():
+            Blob.lock(dict(manifest.values()))
+            for value, shas in by_encodings.items():
+                Blob.objects.filter(pk__in=shas).update(encodings=value)
+            old = list(self.files.values_list("blob_id", flat=True))
+            self.files.all().delete()
+            GameFile.objects.bulk_create(
+                [GameFile(game=self, path=path, blob_id=sha256) for path, (sha256, _) in manifest.items()]
+            )
+            Blob.adjust_ref_counts(Counter(sha256 for sha256, _ in manifest.values()))
+            Blob.adjust_ref_counts(Counter(old), sign=-1)
+            self.build += 1
+            self.save(update_fields=["build"])
+            if old:
+                transaction.on_commit(lambda: Blob.collect_garbage(old))
+
+    def release_files(self):
+        """Drop the game's files, freeing blobs no other game references."""
+        self.replace_files({})
 
     def delete(self, *args, **kwargs):
         """
-        Delete the entire game folder in /media/games/<slug>/ along with all its contents.
+        Release the game's blobs and delete the game folder in /media/games/<slug>/
+        holding the uploaded ZIP, if it is still there.
         """
+        with transaction.atomic():
+            self.release_files()
+            super().delete(*args, **kwargs)
         if self.slug:
             game_dir = os.path.join(settings.MEDIA_ROOT, "games", self.slug)
             if os.path.exists(game_dir):
                 shutil.rmtree(game_dir)
-        super().delete(*args, **kwargs)
 
     @property
     def source(self):
         """Return the URL for iframe embed."""
-        if self.zip_file:
-            return self.extracted_path.url
-        elif self.url:
+        if self.url:
             return self.url
+        if self.status == self.STATUS_READY and self.build:
+            return reverse("game_file", args=[self.pk, self.build, "index.html"])
         return None
 
     def __str__(self):
         return self.title
+
+
+class Blob(models.Model):
+    """
+    A file in the content-addressed store, shared by every game shipping
+    the same bytes.
+    """
+    sha256 = models.CharField(max_length=64, primary_key=True, help_text="SHA-256 of the content")
+    size = models.BigIntegerField(help_text="Size in bytes")
+    ref_count = models.PositiveIntegerField(default=0, help_text="Number of game files using this blob")
+    encodings = models.CharField(
+        max_length=32,
+        blank=True,
+        help_text="Pre-compressed variants stored next to the blob, e.g. 'br,gzip'",
+    )
+
+    @property
+    def path(self):
+        return blob_path(self.sha256)
+
+    def get_encodings(self):
+        return self.encodings.split(",") if self.encodings else []
+
+    @classmethod
+    def adjust_ref_counts(cls, counts, sign=1):
+        """Add ``sign * n`` to the count of each blob in the ``{sha256: n}`` mapping."""
+        by_delta = {}
+        for sha256, n in counts.items():
+            by_delta.setdefault(n, []).append(sha256)
+        for n, shas in by_delta.items():
+            cls.objects.filter(pk__in=shas).update(ref_count=F("ref_count") + sign * n)
+
+    @classmethod
+    def lock(cls, sizes):
+        """
+        Make sure a row exists for each blob of the ``{sha256: size}``
+        mapping and lock those rows until the transaction ends.
+
+        Garbage collection deletes rows and files under the same lock, so
+        while it is held a blob's file can be checked for and written
+        without it disappearing underneath.
+        """
+        while sizes:
+            cls.objects.bulk_create(
+                [cls(sha256=sha256, size=size) for sha256, size in sizes.items()], ignore_conflicts=True
+            )
+            locked = set(cls.objects.select_for_update().filter(pk__in=sizes).values_list("pk", flat=True))
+            # A row collected between the insert and the lock is inserted again
+            sizes = {sha256: size for sha256, size in sizes.items() if sha256 not in locked}
+
+    @classmethod
+    def collect_garbage(cls, shas=None):
+        """
+        Delete unreferenced blobs and their files, limited to ``shas`` when
+        given. Files are removed while the rows are still locked, so a game
+        being processed either keeps the blob alive or finds its file gone
+        and writes it again, see ``lock``.
+
+        If the deletion then fails to commit, the rows survive without
+        files. They are unreferenced, and the next game using them rewrites
+        the files.
+        """
+        with transaction.atomic():
+            unused = cls.objects.select_for_update().filter(ref_count=0)
+            if shas is not None:
+                unused = unused.filter(pk__in=shas)
+            freed = list(unused.values_list("pk", flat=True))
+            cls.objects.filter(pk__in=freed, ref_count=0).delete()
+            for sha256 in freed:
+                remove_blob(sha256)
+        return freed
+
+    @classmethod
+    def rebuild_ref_counts(cls):
+        """Recompute every blob's reference count from the game manifests."""
+        counts = (
+            GameFile.objects.filter(blob=OuterRef("pk"))
+            .order_by()
+            .values("blob")
+            .annotate(total=Count("pk"))
+            .values("total")
+        )
+        return cls.objects.update(ref_count=Coalesce(Subquery(counts), 0))
+
+    def __str__(self):
+        return self.sha256
+
+
+class GameFile(models.Model):
+    """One path of a game's manifest, pointing at the blob holding its bytes."""
+    game = models.ForeignKey(WebGame, on_delete=models.CASCADE, related_name="files")
+    path = models.CharField(max_length=1024, help_text="Path of the file inside the game")
+    blob = models.ForeignKey(Blob, on_delete=models.PROTECT, related_name="game_files")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["game", "path"], name="unique_game_file_path"),
+        ]
+
+    def __str__(self):
+        return f"{self.game}: {self.path}"
+
+
+class GameUpload(models.Model):
+    """
+    A ZIP being uploaded in chunks. Chunks are appended in order to a part
+    file, so an interrupted upload resumes from ``received``.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="game_uploads",
+    )
+    filename = models.CharField(max_length=255, help_text="Name of the file being uploaded")
+    size = models.BigIntegerField(help_text="Total size announced by the client, in bytes")
+    received = models.BigIntegerField(default=0, help_text="Bytes stored so far")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def path(self):
+        return os.path.join(settings.MEDIA_ROOT, "uploads", f"{self.pk}.part")
+
+    @property
+    def is_complete(self):
+        return self.received == self.size
+
+    @classmethod
+    def start(cls, user, filename, size):
+        """
+        Open a new upload after checking it fits the size limit and what is
+        left of the user's quota for unfinished uploads.
+        """
+        if not filename.lower().endswith(".zip"):
+            raise ValidationError("Uploaded file must be a ZIP archive.")
+        if size <= 0:
+            raise ValidationError("The file is empty.")
+        if size > settings.WEBGAME_MAX_UPLOAD_BYTES:
+            raise ValidationError(f"Max file size is {settings.WEBGAME_MAX_UPLOAD_BYTES / (1024*1024)} MB")
+        open_bytes = user.game_uploads.aggregate(total=Coalesce(models.Sum("size"), 0))["total"]
+        if open_bytes + size > settings.WEBGAME_UPLOAD_QUOTA_BYTES:
+            raise ValidationError("You have too many unfinished uploads, finish or discard them first.")
+
+        upload = cls.objects.create(user=user, filename=os.path.basename(filename), size=size)
+        os.makedirs(os.path.dirname(upload.path), exist_ok=True)
+        open(upload.path, "wb").close()
+        return upload
+
+    def write_chunk(self, stream, start, length, sha256):
+        """
+        Store ``length`` bytes read from ``stream`` at offset ``start``.
+
+        Bytes are counted as they arrive, so a client sending more than it
+        announced is cut off instead of filling the disk, and the chunk is
+        discarded unless its SHA-256 matches ``sha256``. The chunk is staged
+        in its own temporary file and only copied into the part file by the
+        request that advances ``received``, so a failing retry of the same
+        range never touches bytes another request already stored. Returns
+        whether the chunk was recorded; ``False`` means another request
+        stored the same range first.
+        """
+        if start != self.received:
+            raise ValidationError(f"Expected a chunk starting at byte {self.received}.")
+        if length <= 0 or length > settings.WEBGAME_UPLOAD_CHUNK_BYTES or start + length > self.size:
+            raise ValidationError("Chunk is empty, too large or past the end of the file.")
+
+        digest = hashlib.sha256()
+        written = 0
+        with tempfile.TemporaryFile(dir=os.path.dirname(self.path)) as chunk:
+            while data := stream.read(min(settings.WEBGAME_EXTRACT_CHUNK_BYTES, length - written + 1)):
+                written += len(data)
+                if written > length:
+                    raise ValidationError("Chunk is longer than its Content-Range.")
+                digest.update(data)
+                chunk.write(data)
+            if written != length:
+                raise ValidationError("Chunk is shorter than its Content-Range.")
+            if digest.hexdigest() != sha256.lower():
+                raise ValidationError("Chunk checksum does not match.")
+
+            with transaction.atomic():
+                # The conditional update claims the range, a concurrent
+                # request for it waits here and then finds nothing to update
+                updated = GameUpload.objects.filter(pk=self.pk, received=start).update(
+                    received=start + length, updated_at=timezone.now()
+                )
+                if updated:
+                    chunk.seek(0)
+                    with open(self.path, "r+b") as fp:
+                        fp.seek(start)
+                        shutil.copyfileobj(chunk, fp)
+                        fp.truncate()
+        if updated:
+            self.received = start + length
+        return bool(updated)
+
+    def as_file(self):
+        """
+        The finished upload as a file Django's storage moves into place
+        rather than copying.
+        """
+        return AssembledUpload(self.path, self.filename)
+
+    def delete(self, *args, **kwargs):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        super().delete(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size})"
+
+
+class AssembledUpload(File):
+    """An assembled upload on disk, like Django's ``TemporaryUploadedFile``."""
+
+    def __init__(self, path, name):
+        super().__init__(None, name=name)
+        self._path = path
+
+    @property
+    def size(self):
+        return os.path.getsize(self._path)
+
+    def temporary_file_path(self):
+        return self._path
+
+    def open(self, mode="rb"):
+        self.file = open(self._path, mode)
+        return self
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.cache import invalidate_cache_tags
+
+from .models import WebGame
+
+
+@receiver([post_save, post_delete], sender=WebGame)
+def game_changed(sender, instance, **kwargs):
+    invalidate_cache_tags("games")
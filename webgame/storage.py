@@ -0,0 +1,119 @@
+import gzip
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:  # optional, gzip variants are still written without it
+    brotli = None
+
+# Content-Encoding of each pre-compressed variant and its file suffix,
+# in order of preference
+VARIANT_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+class BlobMismatch(Exception):
+    """Raised when data written to the blob store does not match its hash."""
+
+
+def blob_root():
+    return os.path.join(settings.MEDIA_ROOT, "blobs")
+
+
+def blob_path(sha256):
+    """
+    Return where the blob with the given hash lives, fanned out over two
+    directory levels so no single directory grows huge.
+    """
+    return os.path.join(blob_root(), sha256[:2], sha256[2:4], sha256)
+
+
+def write_blob(src, sha256, chunk_size):
+    """
+    Copy ``src`` into the store as blob ``sha256``.
+
+    The data goes to a temporary file first and is renamed into place once
+    its hash is verified, so readers never see a partial blob.
+    """
+    path = blob_path(sha256)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), prefix=".tmp-", delete=False) as tmp:
+        try:
+            while chunk := src.read(chunk_size):
+                digest.update(chunk)
+                tmp.write(chunk)
+        except BaseException:
+            os.unlink(tmp.name)
+            raise
+    if digest.hexdigest() != sha256:
+        os.unlink(tmp.name)
+        raise BlobMismatch(f"Blob {sha256} changed while it was stored")
+    os.replace(tmp.name, path)
+    return path
+
+
+def variant_path(sha256, encoding):
+    return blob_path(sha256) + VARIANT_SUFFIXES[encoding]
+
+
+def _compressors():
+    yield "gzip", lambda fp: gzip.GzipFile(fileobj=fp, mode="wb", compresslevel=9, mtime=0)
+    if brotli is not None:
+        yield "br", _BrotliWriter
+
+
+class _BrotliWriter:
+    def __init__(self, fp):
+        self.fp = fp
+        self.compressor = brotli.Compressor(quality=9)
+
+    def write(self, data):
+        self.fp.write(self.compressor.process(data))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if exc_info[0] is None:
+            self.fp.write(self.compressor.finish())
+
+
+def write_variants(sha256, chunk_size, min_saving=0.05):
+    """
+    Write gzip (and, when installed, brotli) variants of a stored blob next
+    to it, keeping only those that save at least ``min_saving`` of the size.
+    Returns the encodings that were kept.
+    """
+    path = blob_path(sha256)
+    size = os.path.getsize(path)
+    kept = []
+    for encoding, compressor in _compressors():
+        target = variant_path(sha256, encoding)
+        with open(path, "rb") as src, tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(path), prefix=".tmp-", delete=False
+        ) as tmp:
+            try:
+                with compressor(tmp) as dst:
+                    while chunk := src.read(chunk_size):
+                        dst.write(chunk)
+            except BaseException:
+                os.unlink(tmp.name)
+                raise
+        if os.path.getsize(tmp.name) <= size * (1 - min_saving):
+            os.replace(tmp.name, target)
+            kept.append(encoding)
+        else:
+            os.unlink(tmp.name)
+    return [encoding for encoding in VARIANT_SUFFIXES if encoding in kept]
+
+
+def remove_blob(sha256):
+    for path in [blob_path(sha256), *(variant_path(sha256, e) for e in VARIANT_SUFFIXES)]:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,186 @@
+import hashlib
+import logging
+import mimetypes
+import os
+import stat
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Blob, WebGame
+from .storage import BlobMismatch, blob_path, write_blob, write_variants
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.WEBGAME_EXTRACT_WORKERS, thread_name_prefix="webgame-process"
+)
+
+
+class ArchiveError(Exception):
+    """Raised when an uploaded archive is unsafe or exceeds the limits."""
+
+
+def enqueue_processing(game):
+    """
+    Queue the game's ZIP for processing once the current transaction commits.
+    """
+    game_id = game.pk
+    transaction.on_commit(lambda: _executor.submit(_run_in_worker, game_id))
+
+
+def _run_in_worker(game_id):
+    try:
+        process_game(game_id)
+    except Exception:
+        logger.exception("Processing of game %s crashed", game_id)
+    finally:
+        # Worker threads own their connection, don't leak it between jobs
+        connection.close()
+
+
+def member_path(name):
+    """
+    Return the safe relative path of an archive member, or raise.
+    """
+    path = PurePosixPath(name.replace("\\", "/"))
+    if not path.parts or path.is_absolute() or ".." in path.parts or ":" in path.parts[0]:
+        raise ArchiveError(f"Unsafe path in archive: {name}")
+    return path
+
+
+def hash_member(zf, info, remaining):
+    """
+    Decompress one member in bounded chunks, without writing it anywhere.
+    Sizes are checked against what is actually decompressed, not only the
+    declared sizes, so a forged header cannot smuggle a ZIP bomb through,
+    and the CRC is verified on the way. Returns ``(sha256, size)``.
+    """
+    limit = min(info.file_size, settings.WEBGAME_MAX_MEMBER_BYTES, remaining)
+    if info.file_size > limit:
+        raise ArchiveError(f"{info.filename} is too large")
+
+    size = 0
+    digest = hashlib.sha256()
+    with zf.open(info) as src:
+        while chunk := src.read(settings.WEBGAME_EXTRACT_CHUNK_BYTES):
+            size += len(chunk)
+            if size > limit:
+                raise ArchiveError(f"{info.filename} is larger than declared")
+            digest.update(chunk)
+    return digest.hexdigest(), size
+
+
+def read_manifest(zip_path):
+    """
+    Check every member of ``zip_path`` for unsafe paths, sizes and corrupt
+    data, streaming through the archive once, and return the manifest
+    mapping each file's path to its ``(sha256, size)``.
+    """
+    manifest = {}
+    remaining = settings.WEBGAME_MAX_EXTRACTED_BYTES
+    with zipfile.ZipFile(zip_path, "r") as zf:
+        members = zf.infolist()
+        if len(members) > settings.WEBGAME_MAX_MEMBERS:
+            raise ArchiveError(f"Archive has more than {settings.WEBGAME_MAX_MEMBERS} files")
+
+        for info in members:
+            path = member_path(info.filename)
+            if stat.S_ISLNK(info.external_attr >> 16):
+                raise ArchiveError(f"Symbolic links are not allowed: {info.filename}")
+            if info.flag_bits & 0x1:
+                raise ArchiveError(f"Encrypted files are not allowed: {info.filename}")
+            if not info.is_dir():
+                if str(path) in manifest:
+                    raise ArchiveError(f"Duplicate path in archive: {info.filename}")
+                manifest[str(path)] = hash_member(zf, info, remaining)
+                remaining -= manifest[str(path)][1]
+
+    if "index.html" not in manifest:
+        raise ArchiveError("The archive has no index.html at its root")
+    return manifest
+
+
+# Formats that are already compressed gain nothing from gzip or brotli
+INCOMPRESSIBLE_TYPES = {
+    "application/gzip",
+    "application/zip",
+    "application/x-brotli",
+    "font/woff",
+    "font/woff2",
+}
+
+
+def is_compressible(path, size):
+    if size < settings.WEBGAME_COMPRESS_MIN_BYTES:
+        return False
+    content_type, encoding = mimetypes.guess_type(path)
+    if encoding or content_type in INCOMPRESSIBLE_TYPES:
+        return False
+    if content_type and content_type.split("/")[0] in ("image", "audio", "video"):
+        return content_type == "image/svg+xml"
+    return True
+
+
+def store_blobs(zip_path, manifest):
+    """
+    Write the members of ``zip_path`` whose content is not in the blob store
+    yet, so disk writes scale with the unique bytes of an upload. New
+    compressible blobs get pre-compressed variants; returns their encodings
+    by hash.
+
+    This runs before any transaction, so the slow writes and compression
+    never hold the database lock. Garbage collection can still remove a file
+    found here until its row is locked, so the caller runs it again under
+    ``Blob.lock`` to rewrite whatever went missing in between.
+    """
+    missing = {path: sha256 for path, (sha256, _) in manifest.items() if not os.path.exists(blob_path(sha256))}
+
+    encodings = {}
+    with zipfile.ZipFile(zip_path, "r") as zf:
+        for info in zf.infolist():
+            path = str(member_path(info.filename))
+            sha256 = missing.get(path)
+            if sha256 is None or os.path.exists(blob_path(sha256)):
+                continue
+            with zf.open(info) as src:
+                write_blob(src, sha256, settings.WEBGAME_EXTRACT_CHUNK_BYTES)
+            if is_compressible(path, info.file_size):
+                encodings[sha256] = write_variants(sha256, settings.WEBGAME_EXTRACT_CHUNK_BYTES)
+    return encodings
+
+
+def process_game(game_id):
+    """
+    Validate a game's uploaded ZIP, move its files into the blob store and
+    record the outcome on its status. The ZIP is deleted once ingested.
+    """
+    game = WebGame.objects.filter(pk=game_id).first()
+    if game is None or not game.zip_file:
+        return
+    zip_name = game.zip_file.name
+    game.set_status(WebGame.STATUS_PROCESSING)
+    # Status changes only apply while the game still holds this ZIP
+    current = WebGame.objects.filter(pk=game.pk, zip_file=zip_name)
+
+    try:
+        manifest = read_manifest(game.zip_file.path)
+        encodings = store_blobs(game.zip_file.path, manifest)
+        with transaction.atomic():
+            Blob.lock(dict(manifest.values()))
+            # Only files collected since the first pass are written here
+            encodings.update(store_blobs(game.zip_file.path, manifest))
+            game.replace_files(manifest, encodings)
+            # A ZIP uploaded meanwhile keeps its pending status and its own job
+            current.update(zip_file="", status=WebGame.STATUS_READY, status_message="")
+    except (ArchiveError, BlobMismatch, zipfile.BadZipFile, OSError) as exc:
+        current.update(status=WebGame.STATUS_FAILED, status_message=str(exc))
+        return
+    except Exception:
+        current.update(status=WebGame.STATUS_FAILED, status_message="Processing failed, please upload the game again.")
+        raise
+
+    game.zip_file.storage.delete(zip_name)
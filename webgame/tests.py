@@ -1,3 +1,249 @@
-from django.test import TestCase
+import gzip
+import hashlib
+import io
+import os
+import tempfile
+import zipfile
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .models import Blob, GameUpload, WebGame
+from .storage import remove_blob
+from .tasks import process_game
+
+User = get_user_model()
+
+
+def make_zip(files, compression=zipfile.ZIP_DEFLATED):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression) as zf:
+        for name, content in files.items():
+            zf.writestr(name, content)
+    return SimpleUploadedFile("game.zip", buffer.getvalue(), content_type="application/zip")
+
+
+class ProcessGameTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.author = User.objects.create_user(username="author", uid="1")
+
+    def upload(self, files, title="Game", **kwargs):
+        # Processing is queued for after the commit, not run in the request
+        game = WebGame.objects.create(title=title, author=self.author, zip_file=make_zip(files, **kwargs))
+        self.assertEqual(game.status, WebGame.STATUS_PENDING)
+        process_game(game.pk)
+        game.refresh_from_db()
+        return game
+
+    def test_validates_in_background_job(self):
+        game = self.upload({"index.html": "<h1>Game</h1>", "js/app.js": "run()"})
+        self.assertEqual(game.status, WebGame.STATUS_READY)
+        self.assertEqual(game.source, reverse("game_file", args=[game.pk, 1, "index.html"]))
+        self.assertFalse(game.zip_file)
+        self.assertEqual(sorted(game.files.values_list("path", flat=True)), ["index.html", "js/app.js"])
+
+    def test_rejects_path_traversal(self):
+        game = self.upload({"index.html": "ok", "../escape.html": "nope"})
+        self.assertEqual(game.status, WebGame.STATUS_FAILED)
+        self.assertIn("Unsafe path", game.status_message)
+        self.assertIsNone(game.source)
+
+    @override_settings(WEBGAME_MAX_EXTRACTED_BYTES=1024)
+    def test_enforces_size_limit(self):
+        game = self.upload({"index.html": "x" * 2048})
+        self.assertEqual(game.status, WebGame.STATUS_FAILED)
+
+    def test_serves_files(self):
+        for compression in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            with self.subTest(compression=compression):
+                for game in WebGame.objects.all():
+                    game.delete()
+                game = self.upload({"index.html": "<h1>Game</h1>", "js/app.js": "0123456789"}, compression=compression)
+                self.client.force_login(self.author)
+                url = reverse("game_file", args=[game.pk, game.build, "js/app.js"])
+
+                response = self.client.get(url)
+                self.assertEqual(b"".join(response.streaming_content), b"0123456789")
+                self.assertEqual(response["Content-Type"], "text/javascript")
+
+                response = self.client.get(url, HTTP_RANGE="bytes=2-5")
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response["Content-Range"], "bytes 2-5/10")
+                self.assertEqual(b"".join(response.streaming_content), b"2345")
+
+                self.assertEqual(self.client.get(url, HTTP_RANGE="bytes=20-").status_code, 416)
+                missing = reverse("game_file", args=[game.pk, game.build, "missing.js"])
+                self.assertEqual(self.client.get(missing).status_code, 404)
+
+                # Unapproved games are only served to their author
+                self.client.logout()
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_unexpected_error_marks_game_failed(self):
+        with mock.patch.object(WebGame, "replace_files", side_effect=RuntimeError("boom")):
+            with self.assertRaises(RuntimeError):
+                self.upload({"index.html": "ok"})
+        game = WebGame.objects.get()
+        self.assertEqual(game.status, WebGame.STATUS_FAILED)
+        self.assertTrue(game.zip_file)
+
+    def test_collected_blob_is_written_again(self):
+        first = self.upload({"index.html": "shared"}, title="First")
+        [blob] = Blob.objects.all()
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertFalse(os.path.exists(blob.path))
+        # A stale row without its file, as left by a collection that failed to commit
+        Blob.objects.create(sha256=blob.sha256, size=blob.size)
+
+        second = self.upload({"index.html": "shared"}, title="Second")
+        self.assertEqual(second.status, WebGame.STATUS_READY)
+        self.assertTrue(os.path.exists(blob.path))
+
+    def test_blob_collected_before_lock_is_written_again(self):
+        script = "function tick() { return 42; }\n" * 200
+        lock = Blob.lock.__func__
+        collected = []
+
+        def collect_then_lock(cls, sizes):
+            # Garbage collection runs between the unlocked write and the lock
+            if not collected:
+                collected.extend(sizes)
+                for sha256 in sizes:
+                    remove_blob(sha256)
+            lock(cls, sizes)
+
+        with mock.patch.object(Blob, "lock", classmethod(collect_then_lock)):
+            game = self.upload({"index.html": "<h1>Game</h1>", "app.js": script})
+        self.assertEqual(game.status, WebGame.STATUS_READY)
+        for blob in Blob.objects.all():
+            self.assertTrue(os.path.exists(blob.path))
+        compressed = Blob.objects.get(size=len(script))
+        self.assertIn("gzip", compressed.encodings)
+        self.assertTrue(os.path.exists(compressed.path + ".gz"))
+
+    def test_blobs_are_shared_and_freed(self):
+        runtime = "engine()" * 100
+        first = self.upload({"index.html": "one", "engine.js": runtime}, title="First")
+        second = self.upload({"index.html": "two", "lib/engine.js": runtime}, title="Second")
+        self.assertEqual(Blob.objects.count(), 3)
+        shared = Blob.objects.get(size=len(runtime))
+        self.assertEqual(shared.ref_count, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        shared.refresh_from_db()
+        self.assertEqual(shared.ref_count, 1)
+        self.assertTrue(os.path.exists(shared.path))
+        self.assertEqual(Blob.objects.count(), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(Blob.objects.exists())
+        self.assertFalse(os.path.exists(shared.path))
+
+    def test_precompressed_and_cached(self):
+        script = "function tick() { return 42; }\n" * 200
+        game = self.upload({"index.html": "<h1>Game</h1>", "app.js": script})
+        self.client.force_login(self.author)
+        url = reverse("game_file", args=[game.pk, game.build, "app.js"])
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("immutable", response["Cache-Control"])
+        body = b"".join(response.streaming_content)
+        self.assertLess(len(body), len(script))
+        self.assertEqual(gzip.decompress(body).decode(), script)
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+        # Other encodings and ranges get the identity bytes under their own ETag
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="identity")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response["ETag"], f'"{game.files.get(path="app.js").blob_id}"')
+        self.assertEqual(b"".join(response.streaming_content).decode(), script)
+
+        old = reverse("game_file", args=[game.pk, game.build - 1, "app.js"])
+        self.assertRedirects(self.client.get(old), url, fetch_redirect_response=False)
+
+
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name, WEBGAME_UPLOAD_CHUNK_BYTES=1024))
+        self.author = User.objects.create_user(username="author", uid="1")
+        self.client.force_login(self.author)
+
+    def put(self, upload_id, data, start, size):
+        return self.client.put(
+            reverse("upload_chunk", args=[upload_id]),
+            data,
+            content_type="application/octet-stream",
+            HTTP_CONTENT_RANGE=f"bytes {start}-{start + len(data) - 1}/{size}",
+            HTTP_X_CHUNK_SHA256=hashlib.sha256(data).hexdigest(),
+        )
+
+    def test_resumable_upload_becomes_game(self):
+        content = make_zip({"index.html": os.urandom(3000).hex()}).read()
+        upload = self.client.post(
+            reverse("upload_create"), {"filename": "game.zip", "size": len(content)}, content_type="application/json"
+        ).json()
+
+        self.assertEqual(self.put(upload["id"], content[:1024], 0, len(content)).json()["received"], 1024)
+        # A repeated or out-of-order chunk is refused with the offset to resume from
+        response = self.put(upload["id"], content[:1024], 0, len(content))
+        self.assertEqual((response.status_code, response.json()["received"]), (409, 1024))
+        # A corrupted chunk is discarded
+        corrupt = self.client.put(
+            reverse("upload_chunk", args=[upload["id"]]),
+            content[1024:2048],
+            content_type="application/octet-stream",
+            HTTP_CONTENT_RANGE=f"bytes 1024-2047/{len(content)}",
+            HTTP_X_CHUNK_SHA256="0" * 64,
+        )
+        self.assertEqual(corrupt.status_code, 400)
+
+        for start in range(1024, len(content), 1024):
+            state = self.put(upload["id"], content[start:start + 1024], start, len(content)).json()
+        self.assertTrue(state["complete"])
+
+        response = self.client.post(reverse("game_upload"), {"title": "Chunked", "upload_id": upload["id"]})
+        game = WebGame.objects.get(title="Chunked")
+        self.assertRedirects(response, reverse("game_play", args=[game.slug]), fetch_redirect_response=False)
+        with game.zip_file.open("rb") as fp:
+            self.assertEqual(fp.read(), content)
+        self.assertFalse(GameUpload.objects.exists())
+
+    def test_failed_retry_keeps_stored_chunk(self):
+        content = os.urandom(2048)
+        upload = GameUpload.start(self.author, "game.zip", len(content))
+        # A retry of the first chunk, loaded before the original was stored
+        retry = GameUpload.objects.get(pk=upload.pk)
+        first = io.BytesIO(content[:1024])
+        self.assertTrue(upload.write_chunk(first, 0, 1024, hashlib.sha256(content[:1024]).hexdigest()))
+
+        with self.assertRaises(ValidationError):
+            retry.write_chunk(io.BytesIO(content[:512]), 0, 1024, hashlib.sha256(content[:1024]).hexdigest())
+        self.assertFalse(retry.write_chunk(io.BytesIO(content[:1024]), 0, 1024, hashlib.sha256(content[:1024]).hexdigest()))
+
+        second = io.BytesIO(content[1024:])
+        self.assertTrue(upload.write_chunk(second, 1024, 1024, hashlib.sha256(content[1024:]).hexdigest()))
+        with open(upload.path, "rb") as fp:
+            self.assertEqual(fp.read(), content)
+
+    @override_settings(WEBGAME_UPLOAD_QUOTA_BYTES=4096)
+    def test_quota(self):
+        url = reverse("upload_create")
+        ok = self.client.post(url, {"filename": "a.zip", "size": 4000}, content_type="application/json")
+        self.assertEqual(ok.status_code, 201)
+        over = self.client.post(url, {"filename": "b.zip", "size": 200}, content_type="application/json")
+        self.assertEqual(over.status_code, 400)
@@ -7,4 +7,7 @@ urlpatterns = [
     path("play/<slug:slug>/", views.game_play, name="game_play"),
     path("edit/<slug:slug>/", views.game_edit, name="game_edit"),
     path("delete/<slug:slug>/", views.game_delete, name="game_delete"),
+    path("uploads/", views.upload_create, name="upload_create"),
+    path("uploads/<uuid:upload_id>/", views.upload_chunk, name="upload_chunk"),
+    path("files/<int:game_id>/<int:build>/<path:path>", views.game_file, name="game_file"),
 ]
\ No newline at end of file
@@ -1,23 +1,39 @@
-from django.http import Http404
+import json
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import Http404, HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.clickjacking import xframe_options_sameorigin
+from django.views.decorators.http import require_http_methods, require_POST
 from .forms import WebGameForm
-from .models import WebGame
-from core.utils import paginate
+from .models import GameFile, GameUpload, WebGame
+from .http import etag_matches, iter_file, negotiate_encoding, parse_range
+from .storage import variant_path
+from core.cache import cache_anonymous_page
+from core.utils import keyset_paginate
 from django.contrib import messages
 
+CONTENT_RANGE_RE = re.compile(r"bytes (?P<start>\d+)-(?P<end>\d+)/(?P<size>\d+)")
+
+
 @login_required
 def game_upload(request):
     if request.method == "POST":
-        form = WebGameForm(request.POST, request.FILES)
+        form = WebGameForm(request.POST, request.FILES, user=request.user)
         if form.is_valid():
             game = form.save(commit=False)
             game.author = request.user
             game.save()
+            form.finish_upload()
             messages.success(request, "Game uploaded successfully.")
             return redirect("game_play", slug=game.slug)
     else:
-        form = WebGameForm()
+        form = WebGameForm(user=request.user)
 
     return render(request, "webgame/game_upload.html", {"form": form})
 
@@ -31,22 +47,147 @@ def game_play(request, slug):
     return render(request, "webgame/game_play.html", {"game": game})
 
 
+@xframe_options_sameorigin
+def game_file(request, game_id, build, path):
+    """
+    Serve one file of a game from the blob store.
+
+    URLs carry the game's id and build number, which both change whenever
+    the content could, so responses are cached as immutable and revalidated
+    by the blob hash as a strong ETag.
+    """
+    game = get_object_or_404(WebGame, pk=game_id, status=WebGame.STATUS_READY)
+    if not game.is_approved and game.author != request.user:
+        raise Http404("Game not found")
+    if build != game.build:
+        # A page embedding an older build, send it to the current one
+        return redirect("game_file", game_id=game.pk, build=game.build, path=path)
+    file = get_object_or_404(GameFile.objects.select_related("blob"), game=game, path=path)
+    blob = file.blob
+
+    # Ranges are served from the identity encoding only
+    range_header = request.headers.get("Range")
+    encoding = None if range_header else negotiate_encoding(
+        request.headers.get("Accept-Encoding"), blob.get_encodings()
+    )
+    etag = f'"{blob.sha256}-{encoding}"' if encoding else f'"{blob.sha256}"'
+    cache_control = "public" if game.is_approved else "private"
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"{cache_control}, max-age={settings.WEBGAME_FILE_MAX_AGE}, immutable",
+        "Vary": "Accept-Encoding",
+        "Accept-Ranges": "bytes",
+        "X-Content-Type-Options": "nosniff",
+    }
+
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return HttpResponseNotModified(headers=headers)
+
+    size = blob.size
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        return HttpResponse(status=416, headers={"Content-Range": f"bytes */{size}"})
+
+    content_type, content_encoding = mimetypes.guess_type(path)
+    if not content_type or content_encoding:
+        content_type = "application/octet-stream"
+    if encoding:
+        source = variant_path(blob.sha256, encoding)
+        size = os.path.getsize(source)
+        headers["Content-Encoding"] = encoding
+    else:
+        source = blob.path
+    start, end = byte_range or (0, size - 1)
+    length = max(end - start + 1, 0)
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = length
+
+    return StreamingHttpResponse(
+        iter_file(source, start, length, settings.WEBGAME_EXTRACT_CHUNK_BYTES),
+        status=206 if byte_range else 200,
+        content_type=content_type,
+        headers=headers,
+    )
+
+
+def upload_state(upload):
+    return {
+        "id": str(upload.pk),
+        "size": upload.size,
+        "received": upload.received,
+        "complete": upload.is_complete,
+        "chunk_size": settings.WEBGAME_UPLOAD_CHUNK_BYTES,
+    }
+
+
+@login_required
+@require_POST
+def upload_create(request):
+    """Start a chunked upload, ``{"filename": ..., "size": ...}`` in the body."""
+    try:
+        data = json.loads(request.body)
+        upload = GameUpload.start(request.user, str(data["filename"]), int(data["size"]))
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({"error": "Send the file's name and size"}, status=400)
+    except ValidationError as exc:
+        return JsonResponse({"error": " ".join(exc.messages)}, status=400)
+    return JsonResponse(upload_state(upload), status=201)
+
+
+@login_required
+@require_http_methods(["GET", "PUT", "DELETE"])
+def upload_chunk(request, upload_id):
+    """
+    Report a chunked upload's progress (GET), append a chunk (PUT) or
+    discard it (DELETE).
+
+    Chunks carry ``Content-Range: bytes <start>-<end>/<size>`` and their
+    SHA-256 in ``X-Chunk-SHA256``. A chunk that does not start where the
+    upload left off gets a 409 with the current state to resume from.
+    """
+    upload = get_object_or_404(GameUpload, pk=upload_id, user=request.user)
+    if request.method == "DELETE":
+        upload.delete()
+        return HttpResponse(status=204)
+    if request.method == "GET":
+        return JsonResponse(upload_state(upload))
+
+    match = CONTENT_RANGE_RE.fullmatch(request.headers.get("Content-Range", ""))
+    sha256 = request.headers.get("X-Chunk-SHA256", "")
+    if not match or int(match["size"]) != upload.size or len(sha256) != 64:
+        return JsonResponse({"error": "Send Content-Range and X-Chunk-SHA256 headers"}, status=400)
+    start, end = int(match["start"]), int(match["end"])
+    if start != upload.received:
+        return JsonResponse(upload_state(upload), status=409)
+
+    try:
+        if not upload.write_chunk(request, start, end - start + 1, sha256):
+            upload.refresh_from_db()
+            return JsonResponse(upload_state(upload), status=409)
+    except ValidationError as exc:
+        return JsonResponse({"error": " ".join(exc.messages)}, status=400)
+    return JsonResponse(upload_state(upload))
+
+
+@cache_anonymous_page("games")
 def game_list(request):
     games = WebGame.objects.filter(is_approved=True)
-    page = paginate(request, games)
+    page = keyset_paginate(request, games)
     return render(request, "webgame/game_list.html", {"games": page})
 
 @login_required
 def game_edit(request, slug):
     game = get_object_or_404(WebGame, slug=slug, author=request.user)
     if request.method == "POST":
-        form = WebGameForm(request.POST, request.FILES, instance=game)
+        form = WebGameForm(request.POST, request.FILES, instance=game, user=request.user)
         if form.is_valid():
             form.save()
             messages.success(request, "Game updated successfully.")
             return redirect("game_play", slug=game.slug)
     else:
-        form = WebGameForm(instance=game)
+        form = WebGameForm(instance=game, user=request.user)
 
     return render(request, "webgame/game_edit.html", {"form": form, "game": game})
 